@@ -67,13 +67,14 @@ class EmergencyDashboard(HydraHeadApp):
         with col1:
             st.markdown("### 💊 Current Medications")
             from data.patient_medications import get_active_patient_medications
-            from data.medications import get_drug_display_name
+            from data.medications import get_drug_display_names
             from components.medication_card import _get_medication_icon
             meds = get_active_patient_medications(patient_id)
             if meds:
+                drug_names = get_drug_display_names(med.get('drug_id') for med in meds)
                 for med in meds:
                     drug_id = med.get('drug_id')
-                    drug_name = get_drug_display_name(drug_id).title() if drug_id else 'Unknown'
+                    drug_name = drug_names.get(drug_id, f"Drug {drug_id}").title() if drug_id else 'Unknown'
                     dose = med.get('dose', '')
                     timing = med.get('timing', '')
                     prescribed_by = med.get('prescribed_by', '')
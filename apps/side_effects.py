@@ -158,6 +158,9 @@ class SideEffects(HydraHeadApp):
             from components.medication_side_effect import render_patient_side_effect_cards
             render_patient_side_effect_cards(patient_id)
 
+            from components.regimen_side_effects import render_regimen_side_effect_risk
+            render_regimen_side_effect_risk(patient_id)
+
         with col_sidebar:
             # Add filter dropdown
             st.subheader("📋 Reports")
@@ -183,8 +186,10 @@ class SideEffects(HydraHeadApp):
             else:  # Resolved
                 filtered_reports = get_resolved_patient_side_effect_reports(patient_id)
             
-            # Display filtered reports
+            # Display filtered reports (doctor notes for all of them in one query)
             if filtered_reports:
+                from data.side_effect_requests import attach_doctor_notes
+                attach_doctor_notes(filtered_reports)
                 for report in filtered_reports:
                     from components.side_effect_report import render_side_effect_report_card
                     render_side_effect_report_card(report, show_doctor_notes=True)
@@ -7,54 +7,85 @@ def register_user(email: str, password: str, role: int, first_name: str, last_na
         bcrypt.gensalt()
     ).decode("utf-8")
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    try:
-        cur.execute(
-            """
-            INSERT INTO users (email, password, role, first_name, last_name, date_of_birth)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (email, hashed_pw, role, first_name, last_name, date_of_birth)
-        )
-        conn.commit()
-        return True
-
-    except Exception as e:
-        conn.rollback()
-        print(e)
-        return False
-
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            cur.execute(
+                """
+                INSERT INTO users (email, password, role, first_name, last_name, date_of_birth)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (email, hashed_pw, role, first_name, last_name, date_of_birth)
+            )
+            conn.commit()
+            return True
+
+        except Exception as e:
+            conn.rollback()
+            print(e)
+            return False
+
+        finally:
+            cur.close()
 
 
 def login_user(email: str, password: str):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    try:
-        cur.execute(
-            """
-            SELECT user_id, password, role, first_name, last_name, date_of_birth
-            FROM users
-            WHERE email = %s
-            """,
-            (email,)
-        )
-        user = cur.fetchone()
-
-        if user is None:
+    with get_connection() as conn:
+        cur = conn.cursor()
+
+        try:
+            cur.execute(
+                """
+                SELECT user_id, password, role, first_name, last_name, date_of_birth
+                FROM users
+                WHERE email = %s
+                """,
+                (email,)
+            )
+            user = cur.fetchone()
+
+            if user is None:
+                return None
+
+            user_id, stored_hash, role, first_name, last_name, date_of_birth = user
+
+            if bcrypt.checkpw(
+                password.encode("utf-8"),
+                stored_hash.encode("utf-8")
+            ):
+                return {
+                    "user_id": user_id,
+                    "email": email,
+                    "role": role,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "date_of_birth": date_of_birth,
+                }
+
             return None
 
-        user_id, stored_hash, role, first_name, last_name, date_of_birth = user
+        finally:
+            cur.close()
+
 
-        if bcrypt.checkpw(
-            password.encode("utf-8"),
-            stored_hash.encode("utf-8")
-        ):
+def get_user_by_email(email: str):
+    """Return user dict for given email, or None."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT user_id, email, role, first_name, last_name, date_of_birth
+                FROM users
+                WHERE email = %s
+                """,
+                (email,)
+            )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            user_id, email, role, first_name, last_name, date_of_birth = row
             return {
                 "user_id": user_id,
                 "email": email,
@@ -63,120 +94,83 @@ def login_user(email: str, password: str):
                 "last_name": last_name,
                 "date_of_birth": date_of_birth,
             }
-
-        return None
-
-    finally:
-        cur.close()
-        conn.close()
-
-
-def get_user_by_email(email: str):
-    """Return user dict for given email, or None."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT user_id, email, role, first_name, last_name, date_of_birth
-            FROM users
-            WHERE email = %s
-            """,
-            (email,)
-        )
-        row = cur.fetchone()
-        if row is None:
-            return None
-        user_id, email, role, first_name, last_name, date_of_birth = row
-        return {
-            "user_id": user_id,
-            "email": email,
-            "role": role,
-            "first_name": first_name,
-            "last_name": last_name,
-            "date_of_birth": date_of_birth,
-        }
-    finally:
-        cur.close()
-        conn.close()
+        finally:
+            cur.close()
 
 
 def get_user_by_id(user_id: int):
     """Return user dict for given user_id, or None."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT user_id, email, role, first_name, last_name, date_of_birth
-            FROM users
-            WHERE user_id = %s
-            """,
-            (user_id,)
-        )
-        row = cur.fetchone()
-        if row is None:
-            return None
-        user_id, email, role, first_name, last_name, date_of_birth = row
-        return {
-            "user_id": user_id,
-            "email": email,
-            "role": role,
-            "first_name": first_name,
-            "last_name": last_name,
-            "date_of_birth": date_of_birth,
-        }
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT user_id, email, role, first_name, last_name, date_of_birth
+                FROM users
+                WHERE user_id = %s
+                """,
+                (user_id,)
+            )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            user_id, email, role, first_name, last_name, date_of_birth = row
+            return {
+                "user_id": user_id,
+                "email": email,
+                "role": role,
+                "first_name": first_name,
+                "last_name": last_name,
+                "date_of_birth": date_of_birth,
+            }
+        finally:
+            cur.close()
 
 
 def update_user_email(user_id: int, new_email: str) -> bool:
     """Update the email for a user. Returns True on success."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            UPDATE users
-            SET email = %s
-            WHERE user_id = %s
-            """,
-            (new_email, user_id)
-        )
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        print("update_user_email error:", e)
-        return False
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE users
+                SET email = %s
+                WHERE user_id = %s
+                """,
+                (new_email, user_id)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print("update_user_email error:", e)
+            return False
+        finally:
+            cur.close()
 
 
 def update_user_profile(user_id: int, first_name: str, last_name: str, date_of_birth) -> bool:
     """Update the user's profile fields (first name, last name, date_of_birth)."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            UPDATE users
-            SET first_name = %s, last_name = %s, date_of_birth = %s
-            WHERE user_id = %s
-            """,
-            (first_name, last_name, date_of_birth, user_id)
-        )
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        print("update_user_profile error:", e)
-        return False
-    finally:
-        cur.close()
-        conn.close()
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE users
+                SET first_name = %s, last_name = %s, date_of_birth = %s
+                WHERE user_id = %s
+                """,
+                (first_name, last_name, date_of_birth, user_id)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print("update_user_profile error:", e)
+            return False
+        finally:
+            cur.close()
 
 
 def change_user_password(user_identifier, old_password: str, new_password: str) -> bool:
@@ -185,38 +179,37 @@ def change_user_password(user_identifier, old_password: str, new_password: str)
     `user_identifier` may be a user_id (int) or email (str).
     Returns True on success, False on failure (wrong current password or DB error).
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with get_connection() as conn:
+        cur = conn.cursor()
 
-    try:
-        if isinstance(user_identifier, int):
-            cur.execute("SELECT password FROM users WHERE user_id = %s", (user_identifier,))
-        else:
-            cur.execute("SELECT password FROM users WHERE email = %s", (user_identifier,))
+        try:
+            if isinstance(user_identifier, int):
+                cur.execute("SELECT password FROM users WHERE user_id = %s", (user_identifier,))
+            else:
+                cur.execute("SELECT password FROM users WHERE email = %s", (user_identifier,))
 
-        row = cur.fetchone()
-        if row is None:
-            return False
+            row = cur.fetchone()
+            if row is None:
+                return False
 
-        stored_hash = row[0]
-        if not bcrypt.checkpw(old_password.encode('utf-8'), stored_hash.encode('utf-8')):
-            return False
+            stored_hash = row[0]
+            if not bcrypt.checkpw(old_password.encode('utf-8'), stored_hash.encode('utf-8')):
+                return False
 
-        new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-        if isinstance(user_identifier, int):
-            cur.execute("UPDATE users SET password = %s WHERE user_id = %s", (new_hash, user_identifier))
-        else:
-            cur.execute("UPDATE users SET password = %s WHERE email = %s", (new_hash, user_identifier))
+            if isinstance(user_identifier, int):
+                cur.execute("UPDATE users SET password = %s WHERE user_id = %s", (new_hash, user_identifier))
+            else:
+                cur.execute("UPDATE users SET password = %s WHERE email = %s", (new_hash, user_identifier))
 
-        conn.commit()
-        return True
+            conn.commit()
+            return True
 
-    except Exception as e:
-        conn.rollback()
-        print("change_user_password error:", e)
-        return False
+        except Exception as e:
+            conn.rollback()
+            print("change_user_password error:", e)
+            return False
 
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+        finally:
+            cur.close()
\ No newline at end of file
@@ -1,6 +1,7 @@
+import os
 import streamlit as st
 from datetime import date
-from data.medications import get_drugs_by_search
+from data.medications import get_drugs_by_search, autocomplete_drugs
 from data.patient_medications import insert_patient_medication
 from data.medication_requests import create_medication_request
 from components.search_component import render_search_interface, clear_search_selection
@@ -19,7 +20,12 @@ def _initialize_session_defaults():
 
 def _search_medications(search_term):
     """Wrapper to format medication search results."""
-    results = get_drugs_by_search(search_term, limit=10)
+    results = []
+    if os.getenv('DRUG_AUTOCOMPLETE'):
+        # In-memory index; falls through to the database for typos it can't match
+        results = autocomplete_drugs(search_term, limit=10)
+    if not results:
+        results = get_drugs_by_search(search_term, limit=10)
     return [{'display_name': drug['display_name'], 'value': drug['drug_id']} for drug in results]
 
 
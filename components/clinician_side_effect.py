@@ -1,13 +1,88 @@
 import streamlit as st
+from datetime import datetime
 from data.patient_profile import get_patient_profile
 from data.patient_side_effect import (
-    get_patient_side_effect_reports,
-    get_active_patient_side_effect_reports,
-    get_resolved_patient_side_effect_reports
+    get_patient_side_effect_reports_page,
+    get_patient_side_effect_analytics
 )
+from data.side_effect_attribution import get_report_attributions
+from data.safety_signals import get_drug_safety_signals
+from data.patient_medications import get_active_patient_medications
+from data.medications import get_drug_display_names
 from components.side_effect_report import render_side_effect_report_card
 
 
+def _render_attribution(suspects, drug_names, shown=3):
+    """Render the ranked suspect medications for one report."""
+    if not suspects:
+        st.caption("🔎 Likely cause: no medications active when this was reported")
+        return
+    parts = []
+    for suspect in suspects[:shown]:
+        frequency = suspect['frequency']
+        known = f"{frequency * 100:.0f}% reported" if frequency is not None else "not a listed effect"
+        parts.append(f"**{drug_names.get(suspect['drug_id'], 'Unknown')}** {suspect['share'] * 100:.0f}% ({known})")
+    st.caption("🔎 Likely cause: " + " · ".join(parts))
+
+
+def _render_population_signals(patient_id):
+    """Render population PRR/ROR signals for the patient's active medications."""
+    drug_ids = [med['drug_id'] for med in get_active_patient_medications(patient_id)]
+    signals = get_drug_safety_signals(drug_ids)
+    if not signals:
+        return
+    drug_names = get_drug_display_names(signal['drug_id'] for signal in signals)
+    with st.expander(f"📈 Population safety signals for current medications ({len(signals)})"):
+        st.caption("Drug/side effect pairs reported disproportionately often across all patients (PRR ≥ 2, χ² ≥ 4, ≥ 3 reports).")
+        for signal in signals:
+            prr_low, prr_high = signal['prr_ci']
+            ror_low, ror_high = signal['ror_ci']
+            st.markdown(
+                f"**{drug_names.get(signal['drug_id'], 'Unknown')}** → {signal['side_effect_name'] or signal['side_effect_id']}: "
+                f"PRR {signal['prr']:.2f} ({prr_low:.2f}–{prr_high:.2f}), "
+                f"ROR {signal['ror']:.2f} ({ror_low:.2f}–{ror_high:.2f}), "
+                f"{signal['report_count']} reports"
+            )
+
+
+REPORTS_PAGE_SIZE = 20
+
+
+def _load_reports(patient_id, status):
+    """Return the reports loaded so far for this filter and the cursor for more.
+
+    The first page is fetched on every rerun so new and resolved reports show
+    up; pages fetched via "Load more" are kept in session state and merged in.
+    """
+    state_key = f'clinician_report_pages_{patient_id}_{status}'
+    first_page, cursor = get_patient_side_effect_reports_page(
+        patient_id, status, REPORTS_PAGE_SIZE, include_notes=True
+    )
+    loaded = st.session_state.get(state_key)
+    if loaded is None or not loaded['reports'] or cursor is None:
+        loaded = {'reports': [], 'cursor': cursor}
+        st.session_state[state_key] = loaded
+    fresh = {report['report_id'] for report in first_page}
+    reports = first_page + [report for report in loaded['reports'] if report['report_id'] not in fresh]
+    # Same order as the query: newest first, undated reports last
+    reports.sort(
+        key=lambda report: (report['reported_at'] is not None, report['reported_at'] or datetime.min, report['report_id']),
+        reverse=True
+    )
+    return reports, loaded['cursor'], state_key
+
+
+def _load_more_reports(patient_id, status, state_key, reports):
+    """Fetch the next page after the last loaded report."""
+    loaded = st.session_state[state_key]
+    last = reports[-1]
+    page, cursor = get_patient_side_effect_reports_page(
+        patient_id, status, REPORTS_PAGE_SIZE, after=(last['reported_at'], last['report_id']), include_notes=True
+    )
+    loaded['reports'] = reports + page
+    loaded['cursor'] = cursor
+
+
 def render_clinician_side_effect_view(patient_id, clinician_id):
     """Render the clinician view showing patient's side effect reports as notifications."""
     
@@ -34,15 +109,15 @@ def render_clinician_side_effect_view(patient_id, clinician_id):
         key="clinician_side_effect_filter"
     )
     
-    # Get filtered reports from database
-    if status_filter == 'All':
-        all_reports = get_patient_side_effect_reports(patient_id)
-    elif status_filter == 'Active':
-        all_reports = get_active_patient_side_effect_reports(patient_id)
-    else:  # Resolved
-        all_reports = get_resolved_patient_side_effect_reports(patient_id)
-    
-    total_count = len(all_reports)
+    # Get the loaded pages of filtered reports; counts come from the analytics query
+    status = status_filter.lower()
+    all_reports, next_cursor, pages_key = _load_reports(patient_id, status)
+    analytics = get_patient_side_effect_analytics(patient_id)
+    total_count = {
+        'all': analytics['total_reports'],
+        'active': analytics['active_reports'],
+        'resolved': analytics['total_reports'] - analytics['active_reports'],
+    }[status]
     
     # Check for new reports (notifications)
     last_seen_count = st.session_state.get(f'clinician_last_seen_reports_{patient_id}', 0)
@@ -70,13 +145,22 @@ def render_clinician_side_effect_view(patient_id, clinician_id):
     </div>
     """, unsafe_allow_html=True)
     
+    _render_population_signals(patient_id)
+    
     # Display all reports
     if all_reports:
         st.subheader(f"📋 All Side Effect Reports ({total_count})")
         
+        # Suspect medications for every report, scored in one batch
+        attributions = get_report_attributions(report['report_id'] for report in all_reports)
+        drug_names = get_drug_display_names(
+            suspect['drug_id'] for suspects in attributions.values() for suspect in suspects
+        )
+        
         for report in all_reports:
             # Show both patient notes and doctor notes for clinicians
             render_side_effect_report_card(report, show_notes=True, show_doctor_notes=True)
+            _render_attribution(attributions.get(report['report_id'], []), drug_names)
             
             # Add doctor note button
             report_id = report.get('report_id')
@@ -113,6 +197,8 @@ def render_clinician_side_effect_view(patient_id, clinician_id):
                         if request_id:
                             st.success("✅ Note sent to patient!")
                             st.session_state[f'show_note_form_{report_id}'] = False
+                            # Cached pages carry their notes; reload them with the new one
+                            st.session_state.pop(pages_key, None)
                             st.rerun()
                         else:
                             st.error("Failed to send note. Please try again.")
@@ -124,5 +210,11 @@ def render_clinician_side_effect_view(patient_id, clinician_id):
                         st.rerun()
             
             st.markdown("<br>", unsafe_allow_html=True)
+        
+        if next_cursor is not None:
+            st.caption(f"Showing {len(all_reports)} of {total_count} reports")
+            if st.button("⬇️ Load more", key=f"load_more_reports_{patient_id}_{status}", use_container_width=True):
+                _load_more_reports(patient_id, status, pages_key, all_reports)
+                st.rerun()
     else:
         st.info("No side effect reports from this patient yet.")
@@ -1,10 +1,13 @@
 import streamlit as st
 from data.patient_medications import get_daily_patient_medications
-from data.adherence_stats import get_today_intake_status, get_adherence_for_patient_med_id
+from data.adherence_stats import get_adherence_for_patient_med_ids
+from data.medication_log import get_intake_status_for_day
 from components.medication_card import render_medication_card
-from utils.medication_helpers import build_medication_dict
+from utils.medication_helpers import build_medication_dicts
+from db.instrumentation import query_scope
 
 
+@query_scope('daily schedule')
 def render_daily_medication_schedule(user_id):
     st.subheader("📅 Today's Schedule")
     daily_meds = get_daily_patient_medications(user_id)
@@ -14,10 +17,14 @@ def render_daily_medication_schedule(user_id):
         ("Evening", "🌆", "linear-gradient(135deg, #a78bfa 0%, #7c3aed 100%)")
     ]
     
+    # Today's status for every medication in one query
+    statuses = get_intake_status_for_day([med['id'] for med in daily_meds])
+    adherence_rates = get_adherence_for_patient_med_ids([med['id'] for med in daily_meds])
+    
     # Group medications by timing
     meds_by_period = {p[0]: [] for p in periods}
-    for med in daily_meds:
-        meds_by_period[med['timing']].append(med)
+    for med, medication in zip(daily_meds, build_medication_dicts(daily_meds)):
+        meds_by_period[med['timing']].append((med, medication))
 
     for period, icon, gradient in periods:
         meds = meds_by_period[period]
@@ -33,8 +40,7 @@ def render_daily_medication_schedule(user_id):
         if not meds:
             st.info(f"No {period.lower()} medications scheduled!")
         else:
-            for med in meds:
-                medication = build_medication_dict(med)
-                status = get_today_intake_status(med['id'])
-                adherence_rate = get_adherence_for_patient_med_id(med['id'])
+            for med, medication in meds:
+                status = statuses.get(med['id'])
+                adherence_rate = adherence_rates.get(med['id'])
                 render_medication_card(medication, med['id'], status=status, context='schedule', adherence_rate=adherence_rate)
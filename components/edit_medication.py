@@ -2,10 +2,10 @@ import streamlit as st
 import datetime
 from data.patient_medications import get_all_patient_medication_entries, update_patient_medication
 from data.medications import get_drug_display_name
-from data.adherence_stats import get_overall_adherence_for_med_id
+from data.adherence_stats import get_overall_adherence_for_med_id, get_overall_adherence_for_med_ids
 from data.medication_requests import create_medication_request
 from components.medication_card import render_medication_card
-from utils.medication_helpers import render_page_header, render_back_button, build_medication_dict, is_clinician
+from utils.medication_helpers import render_page_header, render_back_button, build_medication_dict, build_medication_dicts, is_clinician
 
 
 def _cleanup_edit_session():
@@ -17,10 +17,10 @@ def _cleanup_edit_session():
 def _render_medication_selection(meds):
     """Render medication cards for selection."""
     st.markdown("### 📋 Select a medication to edit")
-    for med in meds:
-        medication = build_medication_dict(med)
+    adherence_rates = get_overall_adherence_for_med_ids(med['drug_id'] for med in meds)
+    for med, medication in zip(meds, build_medication_dicts(meds)):
         active = med.get('status', 'active') == 'active'
-        adherence_rate = get_overall_adherence_for_med_id(med['drug_id'])
+        adherence_rate = adherence_rates.get(med['drug_id'])
         render_medication_card(medication, med['id'], status=None, context='edit', adherence_rate=adherence_rate, active=active)
         if st.button('✅ Select this medication', key=f"select_med_{med['id']}", use_container_width=True):
             st.session_state['edit_selected_med'] = med['id']
@@ -4,11 +4,13 @@ from data.patient_medications import (
     get_active_patient_medications,
     get_inactive_patient_medications
 )
-from data.adherence_stats import get_overall_adherence_for_med_id
+from data.adherence_stats import get_overall_adherence_for_med_ids
 from components.medication_card import render_medication_card
-from utils.medication_helpers import build_medication_dict
+from utils.medication_helpers import build_medication_dicts
+from db.instrumentation import query_scope
 
 
+@query_scope('medication library')
 def show_medication_library(user_id):
     st.subheader("💊 Medication Library")
     status_filter = st.selectbox(
@@ -25,8 +27,8 @@ def show_medication_library(user_id):
     else:  # Not Active
         meds = get_inactive_patient_medications(user_id)
 
-    for med in meds:
-        medication = build_medication_dict(med)
-        adherence_rate = get_overall_adherence_for_med_id(med['drug_id'])
+    adherence_rates = get_overall_adherence_for_med_ids(med['drug_id'] for med in meds)
+    for med, medication in zip(meds, build_medication_dicts(meds)):
+        adherence_rate = adherence_rates.get(med['drug_id'])
         active = med.get('status', 'active') == 'active'
         render_medication_card(medication, med['id'], status=None, context='library', adherence_rate=adherence_rate, active=active)
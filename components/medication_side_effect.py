@@ -2,14 +2,16 @@ import streamlit as st
 from data.patient_medications import (
     get_active_patient_medications,
 )
-from data.medications import get_drug_display_name
+from data.medications import get_drug_display_names
 
-from data.side_effect import get_sideeffects_by_rarity
+from data.side_effect import get_side_effect_profile
 from components.medication_card import render_medication_card
 from components.side_effect_card import render_side_effect_card 
+from db.instrumentation import query_scope
 
 
 
+@query_scope('side effect cards')
 def render_patient_side_effect_cards(patient_id):
     """Render side effect cards for all active patient medications with real data."""
     st.subheader("💊 Medication Side Effect Profiles")
@@ -26,14 +28,13 @@ def render_patient_side_effect_cards(patient_id):
     if 'side_effects_expanded' not in st.session_state:
         st.session_state['side_effects_expanded'] = {}
     
+    drug_names = get_drug_display_names(med['drug_id'] for med in active_medications)
     for med in active_medications:
         drug_id = med['drug_id']
-        drug_name = get_drug_display_name(drug_id)
+        drug_name = drug_names.get(drug_id, f"Drug {drug_id}")
         
-        # Fetch side effects by rarity
-        common_effects = get_sideeffects_by_rarity(drug_id, 'common')
-        uncommon_effects = get_sideeffects_by_rarity(drug_id, 'uncommon')
-        rare_effects = get_sideeffects_by_rarity(drug_id, 'rare')
+        # Fetch side effects grouped by rarity
+        profile = get_side_effect_profile(drug_id)
         
         # Prepare medication data for side effect card
         medication_data = {
@@ -45,9 +46,10 @@ def render_patient_side_effect_cards(patient_id):
             'dose': med.get('dose', ''),
             'instructions': med.get('instructions', ''),
             'prescribed_by': med.get('prescribed_by', ''),
-            'common_side_effects': common_effects,
-            'uncommon_side_effects': uncommon_effects,
-            'rare_effects': rare_effects,
+            'common_side_effects': profile['common'],
+            'uncommon_side_effects': profile['uncommon'],
+            'rare_effects': profile['rare'],
+            'all_side_effects': profile['all'],
             'icon': '💊',
             'color': '#ef4444',
         }
@@ -0,0 +1,68 @@
+import html
+
+import streamlit as st
+
+from data.patient_medications import get_active_patient_medications
+from data.medications import get_drug_display_names
+from data.side_effect import get_regimen_side_effect_risk
+from db.instrumentation import query_scope
+
+
+def _probability_style(probability):
+    """Return (border, badge background, badge text) colours for a combined probability."""
+    if probability > 0.5:
+        return "#dc2626", "#fee2e2", "#991b1b"
+    if probability > 0.2:
+        return "#f59e0b", "#fef3c7", "#92400e"
+    return "#e5e7eb", "#dbeafe", "#1e40af"
+
+
+def _render_effect_row(effect, drug_names):
+    probability = effect['probability']
+    pt_name = html.escape(effect['pt_name'] or 'Unknown side effect')
+    border, badge_bg, badge_text = _probability_style(probability)
+    contributors = ", ".join(
+        f"{html.escape(drug_names.get(c['drug_id']) or 'Drug ' + str(c['drug_id']))} ({c['frequency'] * 100:.0f}%)"
+        for c in effect['contributors']
+    )
+    st.markdown(f"""
+    <div style='border: 1px solid {border}; border-radius: 8px; padding: 10px 12px; margin-bottom: 8px; background: #ffffff;'>
+        <div style='display: flex; justify-content: space-between; align-items: center;'>
+            <div style='font-weight: 600; font-size: 15px; color: #1f2937;'>{pt_name}</div>
+            <div style='background: {badge_bg}; color: {badge_text}; padding: 4px 8px; border-radius: 8px; font-size: 11px; font-weight: 600;'>
+                {probability * 100:.1f}%
+            </div>
+        </div>
+        <div style='color: #6b7280; font-size: 12px; margin-top: 4px;'>From: {contributors}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+@query_scope('regimen side effects')
+def render_regimen_side_effect_risk(patient_id, limit=50, shown=10):
+    """Render the combined side effect profile of all active medications."""
+    active_medications = get_active_patient_medications(patient_id)
+    # The same drug can be on the list more than once (e.g. two doses)
+    drug_ids = list(dict.fromkeys(med['drug_id'] for med in active_medications if med['drug_id'] is not None))
+    if len(drug_ids) < 2:
+        return
+
+    st.subheader("🧮 Combined Side Effect Risk")
+    st.caption(
+        f"Most likely side effects across your {len(drug_ids)} active medications, "
+        "combining each medication's reported frequency."
+    )
+
+    effects = get_regimen_side_effect_risk(drug_ids, limit=limit)
+    if not effects:
+        st.info("No side effect data available for your current medications.")
+        return
+
+    drug_names = get_drug_display_names(drug_ids)
+    for effect in effects[:shown]:
+        _render_effect_row(effect, drug_names)
+
+    if len(effects) > shown:
+        with st.expander(f"Show {len(effects) - shown} more"):
+            for effect in effects[shown:]:
+                _render_effect_row(effect, drug_names)
@@ -167,8 +167,10 @@ def render_side_effect_search(drug: dict):
     st.markdown("### 🔍 Search Side Effects")
     st.markdown(f"Search for specific side effects associated with **{drug_name}**")
     
-    # Get all side effects for this drug
-    all_side_effects = get_all_sideeffects_for_drug(drug_id)
+    # Get all side effects for this drug (already loaded with the card when available)
+    all_side_effects = drug.get('all_side_effects')
+    if all_side_effects is None:
+        all_side_effects = get_all_sideeffects_for_drug(drug_id)
     
     if not all_side_effects:
         st.info(f"No side effects data available for {drug_name}")
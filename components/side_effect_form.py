@@ -4,7 +4,8 @@ import time
 from data.patient_side_effect import insert_side_effect_report
 from data.patient_medications import get_daily_patient_medications
 from data.side_effect import search_all_side_effects, get_side_effect_id_by_name
-from data.medications import get_drug_display_name
+from data.medications import get_drug_display_names
+from data.side_effect_attribution import rank_suspect_medications
 from components.search_component import render_search_interface, clear_search_selection
 
 
@@ -84,14 +85,31 @@ def render_side_effect_report_form(patient_id):
     
     # Medication selection
     st.markdown("### 📋 Report Details")
+    drug_names = get_drug_display_names(med['drug_id'] for med in daily_meds)
     med_options = ["Not sure / Multiple medications"] + [
-        f"{get_drug_display_name(med['drug_id'])} - {med['dose']} ({med['timing']})" 
+        f"{drug_names.get(med['drug_id'], 'Drug ' + str(med['drug_id']))} - {med['dose']} ({med['timing']})" 
         for med in daily_meds
     ]
     
+    # Once a side effect is picked, pre-select the most likely medication
+    default_index = 0
+    selected_effect = st.session_state.get('side_effect_search_selected')
+    if selected_effect and daily_meds:
+        meddra_id = get_side_effect_id_by_name(selected_effect) if isinstance(selected_effect, str) else selected_effect
+        suspects = rank_suspect_medications(meddra_id, [med['id'] for med in daily_meds])
+        if suspects and suspects[0]['frequency'] is not None:
+            top = suspects[0]
+            med_ids = [med['id'] for med in daily_meds]
+            default_index = med_ids.index(top['patient_med_id']) + 1
+            st.caption(
+                f"💡 Based on known side effects and when you started it, "
+                f"**{drug_names.get(top['drug_id'], 'Drug ' + str(top['drug_id']))}** is the most likely cause ({top['share'] * 100:.0f}%)."
+            )
+    
     selected_med_display = st.selectbox(
         "Which medication do you think caused this? (Optional)",
         med_options,
+        index=default_index,
         help="Select the medication if you know which one caused the side effect"
     )
     
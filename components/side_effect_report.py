@@ -12,11 +12,11 @@ def _get_rarity_style(rarity):
     return styles.get(rarity, styles['unknown'])
 
 
-def _build_doctor_notes_html(report_id, show_notes):
-    """Build HTML for doctor notes section."""
-    from data.side_effect_requests import get_doctor_notes_for_report
-    
-    doctor_notes = get_doctor_notes_for_report(report_id)
+def _build_doctor_notes_html(report_id, show_notes, doctor_notes=None):
+    """Build HTML for doctor notes section (fetching the notes unless preloaded)."""
+    if doctor_notes is None:
+        from data.side_effect_requests import get_doctor_notes_for_report
+        doctor_notes = get_doctor_notes_for_report(report_id)
     
     if not doctor_notes:
         if show_notes:
@@ -55,7 +55,7 @@ def render_side_effect_report_card(report, show_notes=False, show_doctor_notes=F
     if show_doctor_notes or show_notes:
         report_id = report.get('report_id')
         if report_id:
-            doctor_notes_html = _build_doctor_notes_html(report_id, show_notes)
+            doctor_notes_html = _build_doctor_notes_html(report_id, show_notes, report.get('doctor_notes'))
     
     if show_notes and notes:
         # Clinician view with patient notes
@@ -113,6 +113,10 @@ def render_recent_side_effect_reports(reports, total_count=None, show_doctor_not
     st.subheader("📋 Recent Reports")
     
     if reports:
+        if show_doctor_notes:
+            from data.side_effect_requests import attach_doctor_notes
+            attach_doctor_notes([report for report in reports if 'doctor_notes' not in report])
+        
         # Display each report as a card
         for report in reports:
             render_side_effect_report_card(report, show_doctor_notes=show_doctor_notes)
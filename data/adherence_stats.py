@@ -1,23 +1,27 @@
+import psycopg2.errors
+
 from db.database import get_connection
 from data.patient_medications import get_daily_patient_medications
-from data.medication_log import get_today_intake_status
+from data.medication_log import get_intake_status_for_day
 from datetime import date
+from db.instrumentation import query_scope
 
 
-def _calculate_adherence_rate(logs):
-	"""Calculate adherence rate from intake logs."""
-	if not logs:
+def _calculate_adherence_rate(taken, total):
+	"""Calculate adherence rate from taken and total intake counts."""
+	if not total:
 		return None
-	taken_count = sum(1 for row in logs if row[0])
-	return round(100 * taken_count / len(logs))
+	return round(100 * taken / total)
 
 
+@query_scope('today summary')
 def get_today_summary_for_user(user_id):
 	"""Get today's adherence summary for a user."""
 	meds = get_daily_patient_medications(user_id)
 	total = len(meds)
-	taken = sum(1 for med in meds if get_today_intake_status(med['id']) == 'taken')
-	missed = sum(1 for med in meds if get_today_intake_status(med['id']) == 'missed')
+	statuses = list(get_intake_status_for_day([med['id'] for med in meds]).values())
+	taken = statuses.count('taken')
+	missed = statuses.count('missed')
 	remaining = total - taken - missed
 	completion_rate = int((taken / total) * 100) if total > 0 else 0
 	
@@ -34,44 +38,88 @@ def get_today_summary_for_user(user_id):
 	}
 
 
+# Adherence is read from medication_adherence_daily, one row per medication
+# per day kept in step with medication_intake_log by triggers
+# (db/migrations/006_medication_adherence_daily.sql). Until that migration is
+# applied, taken/total are counted over medication_intake_log instead; either
+# way the counting happens in PostgreSQL in a single statement.
+_ROLLUP_QUERY = '''
+	SELECT {select}COALESCE(SUM(d.taken_count), 0), COALESCE(SUM(d.taken_count + d.missed_count), 0)
+	FROM patient_medications pm
+	JOIN medication_adherence_daily d ON d.patient_med_id = pm.patient_med_id
+	WHERE {where}
+	{group_by}
+'''
+_LOG_QUERY = '''
+	SELECT {select}COUNT(*) FILTER (WHERE l.taken), COUNT(*)
+	FROM patient_medications pm
+	JOIN medication_intake_log l ON l.patient_med_id = pm.patient_med_id
+	WHERE {where}
+	{group_by}
+'''
+
+# Flipped to False the first time medication_adherence_daily turns out to be missing.
+_rollup_available = True
+
+
+def _fetch_adherence_counts(where, params, group_by=None):
+	"""Return [(taken, total)] rows, prefixed with the `group_by` column if given."""
+	global _rollup_available
+	parts = {
+		'where': where,
+		'select': f'{group_by}, ' if group_by else '',
+		'group_by': f'GROUP BY {group_by}' if group_by else '',
+	}
+	with get_connection() as conn:
+		with conn.cursor() as cur:
+			if _rollup_available:
+				try:
+					cur.execute(_ROLLUP_QUERY.format(**parts), params)
+					return cur.fetchall()
+				except psycopg2.errors.UndefinedTable:
+					conn.rollback()
+					_rollup_available = False
+					print('adherence: medication_adherence_daily missing, counting medication_intake_log')
+			cur.execute(_LOG_QUERY.format(**parts), params)
+			return cur.fetchall()
+
+
+def _adherence_for(column, value):
+	taken, total = _fetch_adherence_counts(f'pm.{column} = %s', (value,))[0]
+	return _calculate_adherence_rate(taken, total)
+
+
 def get_total_adherence_for_user(user_id):
 	"""Return overall adherence rate (0-100) for all medications for a user."""
-	conn = get_connection()
-	try:
-		with conn.cursor() as cur:
-			cur.execute('SELECT patient_med_id FROM patient_medications WHERE user_id = %s', (user_id,))
-			patient_med_ids = [row[0] for row in cur.fetchall()]
-			if not patient_med_ids:
-				return None
-			
-			cur.execute('SELECT taken FROM medication_intake_log WHERE patient_med_id = ANY(%s)', (patient_med_ids,))
-			return _calculate_adherence_rate(cur.fetchall())
-	finally:
-		conn.close()
+	return _adherence_for('user_id', user_id)
 
 
 def get_overall_adherence_for_med_id(med_id):
 	"""Return adherence rate (0-100) for all patient_med rows with this med_id."""
-	conn = get_connection()
-	try:
-		with conn.cursor() as cur:
-			cur.execute('SELECT patient_med_id FROM patient_medications WHERE drug_id = %s', (med_id,))
-			patient_med_ids = [row[0] for row in cur.fetchall()]
-			if not patient_med_ids:
-				return None
-			
-			cur.execute('SELECT taken FROM medication_intake_log WHERE patient_med_id = ANY(%s)', (patient_med_ids,))
-			return _calculate_adherence_rate(cur.fetchall())
-	finally:
-		conn.close()
+	return _adherence_for('drug_id', med_id)
 
 
 def get_adherence_for_patient_med_id(patient_med_id):
 	"""Return adherence rate (0-100) for a specific patient_med_id."""
-	conn = get_connection()
-	try:
-		with conn.cursor() as cur:
-			cur.execute('SELECT taken FROM medication_intake_log WHERE patient_med_id = %s', (patient_med_id,))
-			return _calculate_adherence_rate(cur.fetchall())
-	finally:
-		conn.close()
+	return _adherence_for('patient_med_id', patient_med_id)
+
+
+def _adherence_by(column, values):
+	values = list(dict.fromkeys(values))
+	rates = dict.fromkeys(values)
+	if not values:
+		return rates
+	rows = _fetch_adherence_counts(f'pm.{column} = ANY(%s)', (values,), group_by=f'pm.{column}')
+	for value, taken, total in rows:
+		rates[value] = _calculate_adherence_rate(taken, total)
+	return rates
+
+
+def get_adherence_for_patient_med_ids(patient_med_ids):
+	"""Return {patient_med_id: adherence rate (0-100) or None} in one query."""
+	return _adherence_by('patient_med_id', patient_med_ids)
+
+
+def get_overall_adherence_for_med_ids(med_ids):
+	"""Return {med_id: adherence rate (0-100) or None} across all patients in one query."""
+	return _adherence_by('drug_id', med_ids)
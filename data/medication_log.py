@@ -1,110 +1,250 @@
+import io
+import itertools
+import psycopg2
+from db.database import get_connection, get_pool
+import streamlit as st
+from datetime import datetime
+from data.missed_intakes import insert_missed_intakes_for_day
+
+# Server-side cursor names must be unique per connection.
+_cursor_ids = itertools.count()
+
+
 def get_today_intake_status(patient_med_id, date_for=None):
 	"""Return 'taken', 'missed', or None for today's intake status."""
-	from datetime import date as dtdate
+	return get_intake_status_for_day([patient_med_id], date_for).get(patient_med_id)
+
+
+def get_intake_status_for_day(patient_med_ids, date_for=None):
+	"""Return {patient_med_id: 'taken' | 'missed' | None} for one day in one query.
+
+	The latest log of the day decides the status. Only that day's time range
+	of medication_intake_log is read.
+	"""
+	from datetime import date as dtdate, datetime, time as dttime, timedelta
 	date_for = date_for or dtdate.today()
-	logs = get_intake_log_for_med(patient_med_id)
-	for log in logs:
-		if log['taken_time'].date() == date_for:
-			return 'taken' if log['taken'] else 'missed'
-	return None
+	patient_med_ids = list(dict.fromkeys(patient_med_ids))
+	statuses = dict.fromkeys(patient_med_ids)
+	if not patient_med_ids:
+		return statuses
+	day_start = datetime.combine(date_for, dttime.min)
+	with get_connection() as conn:
+		try:
+			with conn.cursor() as cur:
+				cur.execute('''
+					SELECT DISTINCT ON (patient_med_id) patient_med_id, taken
+					FROM medication_intake_log
+					WHERE patient_med_id = ANY(%s) AND taken_time >= %s AND taken_time < %s
+					ORDER BY patient_med_id, taken_time DESC
+				''', (patient_med_ids, day_start, day_start + timedelta(days=1)))
+				for patient_med_id, taken in cur.fetchall():
+					statuses[patient_med_id] = 'taken' if taken else 'missed'
+		except Exception as e:
+			st.session_state['db_fetch_error'] = str(e)
+	return statuses
 
 
 def log_missed_intakes_for_day(user_id, date_for=None):
     """
     For the given user and date, log missed intakes for all active meds that have no intake log for that day.
-    Should be called at end of day (e.g., by a scheduled job or from medication_tracker).
+    Uses the same single INSERT ... SELECT as the all-patients sweeper (jobs/missed_intake_sweeper.py),
+    so calling it again, or after the sweeper, logs nothing twice.
     """
-    from datetime import date as dtdate, datetime, time as dttime
+    from datetime import date as dtdate
     date_for = date_for or dtdate.today()
-    # 1. Get all active patient_med_ids for today
-    daily_meds = get_daily_patient_medications(user_id)
-    all_ids = [m['id'] for m in daily_meds]
-    if not all_ids:
-        return 0
-    # 2. Get all intake logs for today for these meds
-    conn = get_connection()
-    logged_ids = set()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT patient_med_id FROM medication_intake_log
-                WHERE patient_med_id = ANY(%s) AND DATE(taken_time) = %s
-            ''', (all_ids, date_for))
-            rows = cur.fetchall()
-            logged_ids = set(row[0] for row in rows)
-    except Exception as e:
-        st.session_state['db_fetch_error'] = str(e)
-    finally:
-        conn.close()
-    # 3. Find missing
-    missing_ids = [mid for mid in all_ids if mid not in logged_ids]
-    if missing_ids:
-        # Use end of day timestamp
-        end_of_day = datetime.combine(date_for, dttime(23,59,59))
-        log_bulk_missed_intakes(missing_ids, end_of_day)
-    return len(missing_ids)
-import psycopg2
-from db.database import get_connection
-import streamlit as st
-from datetime import datetime
-from data.patient_medications import get_daily_patient_medications
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                count = insert_missed_intakes_for_day(cur, date_for, user_id=user_id)
+            conn.commit()
+            return count
+        except Exception as e:
+            st.session_state['db_insert_error'] = str(e)
+            conn.rollback()
+            return 0
 
 
 def log_medication_intake(patient_med_id, taken, taken_time=None):
     """Insert a row into medication_intake_log for a medication event (taken or missed)."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                INSERT INTO medication_intake_log (patient_med_id, taken, taken_time)
-                VALUES (%s, %s, %s)
-            ''', (patient_med_id, taken, taken_time or datetime.now()))
-            conn.commit()
-    except Exception as e:
-        st.session_state['db_insert_error'] = str(e)
-        conn.rollback()
-    finally:
-        conn.close()
-
-def log_bulk_missed_intakes(patient_med_ids, date_for=None):
-    """Insert missed rows for all patient_med_ids for a given day (e.g., at end of day for untaken meds)."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            for med_id in patient_med_ids:
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
                 cur.execute('''
                     INSERT INTO medication_intake_log (patient_med_id, taken, taken_time)
                     VALUES (%s, %s, %s)
-                ''', (med_id, False, date_for or datetime.now()))
+                ''', (patient_med_id, taken, taken_time or datetime.now()))
+                conn.commit()
+        except Exception as e:
+            st.session_state['db_insert_error'] = str(e)
+            conn.rollback()
+
+def log_bulk_missed_intakes(patient_med_ids, date_for=None):
+    """Insert missed rows for all patient_med_ids for a given day (e.g., at end of day for untaken meds).
+
+    Medications that already have a missed row that day are skipped.
+    """
+    taken_time = date_for or datetime.now()
+    return log_intakes_bulk(
+        ((med_id, False, taken_time) for med_id in dict.fromkeys(patient_med_ids)),
+        skip_existing_missed=True
+    )
+
+
+# Keeps a "missed" row out when that medication already has a missed row
+# logged on the same day. Only checks rows already in the table, not other
+# rows of the same write.
+_SKIP_EXISTING_MISSED = '''
+    WHERE v.taken IS TRUE OR NOT EXISTS (
+        SELECT 1 FROM medication_intake_log l
+        WHERE l.patient_med_id = v.patient_med_id AND NOT l.taken
+          AND l.taken_time >= v.taken_time::date AND l.taken_time < v.taken_time::date + 1
+    )
+'''
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value)
+
+
+def _copy_chunk(cur, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(v) for v in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert('COPY intake_import (patient_med_id, taken, taken_time) FROM STDIN', buffer)
+
+
+def log_intakes_bulk(rows, chunk_size=1000, copy_threshold=5000, skip_existing_missed=False):
+    """
+    Write many (patient_med_id, taken, taken_time) rows in one transaction.
+
+    Up to `copy_threshold` rows go in as multi-row INSERT ... VALUES statements
+    of `chunk_size` rows; larger inputs are streamed with COPY FROM STDIN in
+    `chunk_size` pieces into a temporary table and moved over with a single
+    INSERT ... SELECT. taken_time defaults to now when None. Rows are written
+    as given unless `skip_existing_missed` is set, in which case a missed row
+    is dropped when its medication already has a missed row logged that day.
+    Commits once and returns the number of rows inserted (0 on error, nothing
+    is written).
+    """
+    from psycopg2.extras import execute_values
+    row_filter = _SKIP_EXISTING_MISSED if skip_existing_missed else ''
+    now = datetime.now()
+    rows = ((med_id, taken, taken_time or now) for med_id, taken, taken_time in rows)
+    head = list(itertools.islice(rows, copy_threshold + 1))
+    if not head:
+        return 0
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                if len(head) <= copy_threshold:
+                    inserted = 0
+                    for start in range(0, len(head), chunk_size):
+                        execute_values(cur, f'''
+                            INSERT INTO medication_intake_log (patient_med_id, taken, taken_time)
+                            SELECT v.patient_med_id, v.taken, v.taken_time
+                            FROM (VALUES %s) AS v (patient_med_id, taken, taken_time)
+                            {row_filter}
+                        ''', head[start:start + chunk_size],
+                            template='(%s::integer, %s::boolean, %s::timestamp)', page_size=chunk_size)
+                        inserted += cur.rowcount
+                else:
+                    cur.execute('''
+                        CREATE TEMP TABLE IF NOT EXISTS intake_import (
+                            patient_med_id INTEGER, taken BOOLEAN, taken_time TIMESTAMP
+                        ) ON COMMIT DELETE ROWS
+                    ''')
+                    _copy_chunk(cur, head)
+                    while True:
+                        chunk = list(itertools.islice(rows, chunk_size))
+                        if not chunk:
+                            break
+                        _copy_chunk(cur, chunk)
+                    cur.execute(f'''
+                        INSERT INTO medication_intake_log (patient_med_id, taken, taken_time)
+                        SELECT v.patient_med_id, v.taken, v.taken_time FROM intake_import v
+                        {row_filter}
+                    ''')
+                    inserted = cur.rowcount
             conn.commit()
-    except Exception as e:
-        st.session_state['db_insert_error'] = str(e)
-        conn.rollback()
-    finally:
-        conn.close()
-
-def get_intake_log_for_med(patient_med_id):
-	"""Return all intake log rows for a given patient_med_id."""
-	conn = get_connection()
-	logs = []
+            return inserted
+        except Exception as e:
+            st.session_state['db_insert_error'] = str(e)
+            conn.rollback()
+            return 0
+
+def _intake_log_query(patient_med_id, since=None, until=None, limit=None):
+	"""Build the newest-first intake log query for one medication and optional [since, until) window."""
+	query = '''
+		SELECT intake_id, patient_med_id, taken, taken_time
+		FROM medication_intake_log
+		WHERE patient_med_id = %s
+	'''
+	params = [patient_med_id]
+	if since is not None:
+		query += ' AND taken_time >= %s'
+		params.append(since)
+	if until is not None:
+		query += ' AND taken_time < %s'
+		params.append(until)
+	query += ' ORDER BY taken_time DESC'
+	if limit is not None:
+		query += ' LIMIT %s'
+		params.append(limit)
+	return query, tuple(params)
+
+
+def _build_log_dict(row):
+	return {
+		'intake_id': row[0],
+		'patient_med_id': row[1],
+		'taken': row[2],
+		'taken_time': row[3]
+	}
+
+
+def get_intake_log_for_med(patient_med_id, since=None, until=None, limit=None):
+	"""Return intake log rows for a given patient_med_id, newest first.
+
+	`since`/`until` bound taken_time to [since, until) and `limit` caps the
+	number of rows; with neither, the whole history is returned.
+	"""
+	query, params = _intake_log_query(patient_med_id, since, until, limit)
+	with get_connection() as conn:
+		logs = []
+		try:
+			with conn.cursor() as cur:
+				cur.execute(query, params)
+				logs = [_build_log_dict(row) for row in cur.fetchall()]
+		except Exception as e:
+			st.session_state['db_fetch_error'] = str(e)
+	return logs
+
+
+def iter_intake_log_for_med(patient_med_id, since=None, until=None, batch_size=1000):
+	"""Yield intake log rows for a patient_med_id, newest first, without loading them all.
+
+	Backed by a named (server-side) cursor that fetches `batch_size` rows at a
+	time. The cursor gets its own connection straight from the pool, not the
+	run's shared one from db_session(), where another function's commit or
+	rollback would close it mid-stream; that connection stays borrowed until
+	the generator is exhausted or closed.
+	"""
+	query, params = _intake_log_query(patient_med_id, since, until)
+	pool = get_pool()
+	conn = pool.acquire()
 	try:
-		with conn.cursor() as cur:
-			cur.execute('''
-				SELECT intake_id, patient_med_id, taken, taken_time
-				FROM medication_intake_log
-				WHERE patient_med_id = %s
-				ORDER BY taken_time DESC
-			''', (patient_med_id,))
-			rows = cur.fetchall()
-			for row in rows:
-				logs.append({
-					'intake_id': row[0],
-					'patient_med_id': row[1],
-					'taken': row[2],
-					'taken_time': row[3]
-				})
-	except Exception as e:
-		st.session_state['db_fetch_error'] = str(e)
+		with conn.cursor(name=f'intake_log_{next(_cursor_ids)}') as cur:
+			cur.itersize = batch_size
+			cur.execute(query, params)
+			for row in cur:
+				yield _build_log_dict(row)
 	finally:
-		conn.close()
-	return logs
+		pool.release(conn)
@@ -2,14 +2,15 @@ import psycopg2
 from db.database import get_connection
 from datetime import datetime
 from data.patient_medications import get_patient_medication_entry_by_id
-from data.medications import get_drug_display_name
+from data.medications import get_drug_display_names
+from data.notifications import notify
 
 
-def _build_request_dict(row, include_patient_name=False, include_clinician_name=True):
+def _build_request_dict(row, drug_names, include_patient_name=False, include_clinician_name=True):
     """Build a standardized request dictionary from a database row."""
     request = {
         'request_id': row[0],
-        'drug_name': get_drug_display_name(row[2]) if len(row) > 2 else None,
+        'drug_name': drug_names.get(row[2]) if len(row) > 2 else None,
         'dose': row[3],
         'instructions': row[4],
         'timing': row[5] if len(row) > 5 else None,
@@ -36,86 +37,105 @@ def _build_request_dict(row, include_patient_name=False, include_clinician_name=
     return request
 
 
+def _build_request_dicts(rows, **kwargs):
+    """Build request dicts for many rows, resolving every drug name in one query."""
+    drug_names = get_drug_display_names(row[2] for row in rows if len(row) > 2)
+    return [_build_request_dict(row, drug_names, **kwargs) for row in rows]
+
+
 def create_medication_request(patient_id, clinician_id, drug_id, dose, instructions, start_date, end_date, timing, request_type='add', patient_med_id=None):
     """Insert a new medication request into the medication_requests table."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                INSERT INTO medication_requests (
-                    patient_id, clinician_id, drug_id, dose, instructions, start_date, end_date, timing, request_type, responded, approved, created_at, patient_med_id
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (patient_id, clinician_id, drug_id, dose, instructions, start_date, end_date, timing, request_type, False, False, datetime.now(), patient_med_id))
-            conn.commit()
-        return True
-    except Exception as e:
-        print("Error creating medication request:", e)
-        return False
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    INSERT INTO medication_requests (
+                        patient_id, clinician_id, drug_id, dose, instructions, start_date, end_date, timing, request_type, responded, approved, created_at, patient_med_id
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ''', (patient_id, clinician_id, drug_id, dose, instructions, start_date, end_date, timing, request_type, False, False, datetime.now(), patient_med_id))
+                notify(cur, 'medication_requests', patient_id)
+                conn.commit()
+            return True
+        except Exception as e:
+            print("Error creating medication request:", e)
+            return False
 
 
 def get_pending_requests_for_patient(patient_id):
     """Return a list of pending medication requests for the given patient."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name, u.first_name, u.last_name
-                FROM medication_requests r
-                JOIN users u ON r.patient_id = u.user_id
-                JOIN users c ON r.clinician_id = c.user_id
-                WHERE r.patient_id = %s AND r.responded = FALSE
-                ORDER BY r.created_at DESC
-            ''', (patient_id,))
-            rows = cur.fetchall()
-            return [_build_request_dict(row, include_patient_name=True) for row in rows]
-    except Exception as e:
-        print("Error fetching pending medication requests:", e)
-        return []
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name, u.first_name, u.last_name
+                    FROM medication_requests r
+                    JOIN users u ON r.patient_id = u.user_id
+                    JOIN users c ON r.clinician_id = c.user_id
+                    WHERE r.patient_id = %s AND r.responded = FALSE
+                    ORDER BY r.created_at DESC
+                ''', (patient_id,))
+                rows = cur.fetchall()
+                return _build_request_dicts(rows, include_patient_name=True)
+        except Exception as e:
+            print("Error fetching pending medication requests:", e)
+            return []
+
+
+def get_pending_requests_count(patient_id):
+    """Return the number of pending medication requests for the given patient."""
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT COUNT(*) FROM medication_requests
+                    WHERE patient_id = %s AND responded = FALSE
+                ''', (patient_id,))
+                return cur.fetchone()[0]
+        except Exception as e:
+            print("Error counting pending medication requests:", e)
+            return 0
 
 
 def respond_to_medication_request(request_id, approved):
     """Mark a medication request as responded and set approved status."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                UPDATE medication_requests
-                SET responded = TRUE, approved = %s, responded_at = NOW()
-                WHERE request_id = %s
-            ''', (approved, request_id))
-            conn.commit()
-        return True
-    except Exception as e:
-        print("Error responding to medication request:", e)
-        return False
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    UPDATE medication_requests r
+                    SET responded = TRUE, approved = %s, responded_at = NOW()
+                    FROM medication_requests old
+                    WHERE r.request_id = %s AND old.request_id = r.request_id
+                    RETURNING r.patient_id, old.responded
+                ''', (approved, request_id))
+                row = cur.fetchone()
+                if row and not row[1]:
+                    notify(cur, 'medication_requests', row[0], -1)
+                conn.commit()
+            return True
+        except Exception as e:
+            print("Error responding to medication request:", e)
+            return False
 
 
 def get_request_details(request_id):
     """Return all details for a medication request."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name
-                FROM medication_requests r
-                JOIN users c ON r.clinician_id = c.user_id
-                WHERE request_id = %s
-            ''', (request_id,))
-            row = cur.fetchone()
-            if row:
-                return _build_request_dict(row)
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name
+                    FROM medication_requests r
+                    JOIN users c ON r.clinician_id = c.user_id
+                    WHERE request_id = %s
+                ''', (request_id,))
+                row = cur.fetchone()
+                if row:
+                    return _build_request_dicts([row])[0]
+                return None
+        except Exception as e:
+            print("Error fetching request details:", e)
             return None
-    except Exception as e:
-        print("Error fetching request details:", e)
-        return None
-    finally:
-        conn.close()
 
 
 def process_accepted_request(request_id):
@@ -140,24 +160,22 @@ def process_accepted_request(request_id):
 
 def get_all_requests_for_clinician(clinician_id):
     """Return all medication requests created by this clinician, with status info and patient name."""
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name, u.first_name, u.last_name, r.responded, r.approved
-                FROM medication_requests r
-                JOIN users u ON r.patient_id = u.user_id
-                JOIN users c ON r.clinician_id = c.user_id
-                WHERE r.clinician_id = %s
-                ORDER BY r.created_at DESC
-            ''', (clinician_id,))
-            rows = cur.fetchall()
-            return [_build_request_dict(row, include_patient_name=True) for row in rows]
-    except Exception as e:
-        print("Error fetching clinician requests:", e)
-        return []
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT r.request_id, r.patient_id, r.drug_id, r.dose, r.instructions, r.timing, r.request_type, r.patient_med_id, r.start_date, r.end_date, c.first_name, c.last_name, u.first_name, u.last_name, r.responded, r.approved
+                    FROM medication_requests r
+                    JOIN users u ON r.patient_id = u.user_id
+                    JOIN users c ON r.clinician_id = c.user_id
+                    WHERE r.clinician_id = %s
+                    ORDER BY r.created_at DESC
+                ''', (clinician_id,))
+                rows = cur.fetchall()
+                return _build_request_dicts(rows, include_patient_name=True)
+        except Exception as e:
+            print("Error fetching clinician requests:", e)
+            return []
 
 
 def compare_medication_entries(old_entry, new_entry):
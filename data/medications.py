@@ -1,73 +1,323 @@
+# Enhanced medication data with rich details and adherence tracking
+import os
+import threading
+from datetime import datetime, timedelta
+import random
+import psycopg2
+import psycopg2.errors
+from db.database import get_connection
+
+from utils.autocomplete import PrefixIndex
+from utils.cache import TTLCache
+from utils.fuzzy_search import FuzzyIndex
+
+# The drugs table is reference data, so lookups are cached process-wide and
+# shared by every session. Call invalidate_drug_cache() after changing it.
+_DRUG_CACHE_TTL = float(os.getenv('DRUG_CACHE_TTL', '3600'))
+_DRUG_CACHE_SIZE = int(os.getenv('DRUG_CACHE_SIZE', '100000'))
+
+_names_by_id = TTLCache(maxsize=_DRUG_CACHE_SIZE, ttl=_DRUG_CACHE_TTL)
+_ids_by_name = TTLCache(maxsize=_DRUG_CACHE_SIZE, ttl=_DRUG_CACHE_TTL)
+_search_results = TTLCache(maxsize=2048, ttl=_DRUG_CACHE_TTL)
+_catalog_version = 0
+
+
+def _remember_drugs(rows):
+    """Cache (drug_id, display_name) rows in both directions."""
+    rows = list(rows)
+    _names_by_id.update(rows)
+    _ids_by_name.update((name.lower(), drug_id) for drug_id, name in rows if name)
+
+
+def invalidate_drug_cache():
+    """Forget every cached drug lookup and bump the catalog version."""
+    global _catalog_version
+    _names_by_id.invalidate()
+    _ids_by_name.invalidate()
+    _search_results.invalidate()
+    _catalog_version += 1
+
+
+def get_catalog_version():
+    """Return a counter that changes whenever the drug catalog cache is invalidated."""
+    return _catalog_version
+
+
+def get_drug_cache_stats():
+    """Return hit/miss counters for each drug cache."""
+    return {
+        'names_by_id': _names_by_id.stats(),
+        'ids_by_name': _ids_by_name.stats(),
+        'search_results': _search_results.stats(),
+    }
+
+
+def warm_drug_cache():
+    """Load the whole drugs table into the cache (up to its size bound)."""
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT drug_id, display_name FROM drugs ORDER BY drug_id LIMIT %s', (_DRUG_CACHE_SIZE,))
+                rows = cur.fetchall()
+        except Exception as e:
+            print('warm_drug_cache error:', e)
+            return 0
+    _remember_drugs(rows)
+    return len(rows)
+
+
+_autocomplete_index = None
+_autocomplete_version = None
+_fuzzy_index = None
+_fuzzy_version = None
+_drug_index_lock = threading.Lock()
+
+
+def _load_all_drugs(caller):
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT drug_id, display_name FROM drugs')
+                return cur.fetchall()
+        except Exception as e:
+            print(f'{caller} error:', e)
+            return None
+
+
+def get_drug_autocomplete_index():
+    """Return the process-wide PrefixIndex over all drug names.
+
+    Built from the drugs table on first use and rebuilt after the catalog
+    version changes (see invalidate_drug_cache). Returns None if it cannot be
+    loaded.
+    """
+    global _autocomplete_index, _autocomplete_version
+    version = _catalog_version
+    if _autocomplete_index is not None and _autocomplete_version == version:
+        return _autocomplete_index
+    with _drug_index_lock:
+        if _autocomplete_index is not None and _autocomplete_version == version:
+            return _autocomplete_index
+        rows = _load_all_drugs('get_drug_autocomplete_index')
+        if rows is None:
+            return _autocomplete_index
+        _autocomplete_index = PrefixIndex(rows)
+        _autocomplete_version = version
+        return _autocomplete_index
+
+
+def get_drug_fuzzy_index():
+    """Return the process-wide FuzzyIndex over all drug names (same lifecycle as the autocomplete index)."""
+    global _fuzzy_index, _fuzzy_version
+    version = _catalog_version
+    if _fuzzy_index is not None and _fuzzy_version == version:
+        return _fuzzy_index
+    with _drug_index_lock:
+        if _fuzzy_index is not None and _fuzzy_version == version:
+            return _fuzzy_index
+        rows = _load_all_drugs('get_drug_fuzzy_index')
+        if rows is None:
+            return _fuzzy_index
+        _fuzzy_index = FuzzyIndex(rows)
+        _fuzzy_version = version
+        return _fuzzy_index
+
+
+def fuzzy_search_drugs(query, limit=10):
+    """Typo-tolerant drug lookup answered from memory.
+
+    Returns items like get_drugs_by_search, closest first; `score` is
+    1 / (1 + edit distance).
+    """
+    index = get_drug_fuzzy_index()
+    if index is None:
+        return []
+    return [
+        {'drug_id': drug_id, 'display_name': display_name, 'score': 1.0 / (1 + distance)}
+        for drug_id, display_name, distance in index.search(query, limit)
+    ]
+
+
+def autocomplete_drugs(query, limit=10):
+    """Prefix/token-prefix drug lookup answered from memory.
+
+    Returns items like get_drugs_by_search: {'display_name': ..., 'drug_id': ...}.
+    """
+    index = get_drug_autocomplete_index()
+    if index is None:
+        return []
+    return [
+        {'drug_id': drug_id, 'display_name': display_name}
+        for drug_id, display_name in index.search(query, limit)
+    ]
+
+
 def get_drug_display_name(drug_id):
-    from db.database import get_connection
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute('SELECT display_name FROM drugs WHERE drug_id = %s', (drug_id,))
-            row = cur.fetchone()
-            if row:
-                return row[0]
-    except Exception:
-        pass
-    finally:
-        conn.close()
+    name = _names_by_id.get(drug_id)
+    if name is not None:
+        return name
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT display_name FROM drugs WHERE drug_id = %s', (drug_id,))
+                row = cur.fetchone()
+                if row:
+                    _remember_drugs([(drug_id, row[0])])
+                    return row[0]
+        except Exception:
+            pass
     return f"Drug {drug_id}"
+
+
+def get_drug_display_names(drug_ids):
+    """Return {drug_id: display_name} for many drugs in one query.
+
+    Unknown ids map to "Drug <id>", like get_drug_display_name.
+    """
+    ids = list({drug_id for drug_id in drug_ids if drug_id is not None})
+    names = {}
+    for drug_id in ids:
+        name = _names_by_id.get(drug_id)
+        if name is not None:
+            names[drug_id] = name
+    missing = [drug_id for drug_id in ids if drug_id not in names]
+    if missing:
+        with get_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT drug_id, display_name FROM drugs WHERE drug_id = ANY(%s)', (missing,))
+                    rows = cur.fetchall()
+                _remember_drugs(rows)
+                names.update(rows)
+            except Exception as e:
+                print('get_drug_display_names error:', e)
+    return {drug_id: names.get(drug_id, f"Drug {drug_id}") for drug_id in ids}
+
+
 def get_drug_id_by_name(drug_name):
     """Return the drug_id for a given drug name (case-insensitive), or None if not found."""
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT drug_id FROM drugs WHERE display_name ILIKE %s LIMIT 1
-            """,
-            (drug_name,)
-        )
-        row = cur.fetchone()
-        if row:
-            return row[0]
-        return None
-    except Exception as e:
-        print('get_drug_id_by_name error:', e)
+    if not drug_name:
         return None
-    finally:
-        cur.close()
-        conn.close()
-# Enhanced medication data with rich details and adherence tracking
-from datetime import datetime, timedelta
-import random
-from db.database import get_connection
+    drug_id = _ids_by_name.get(drug_name.lower())
+    if drug_id is not None:
+        return drug_id
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT drug_id FROM drugs WHERE display_name ILIKE %s LIMIT 1
+                """,
+                (drug_name,)
+            )
+            row = cur.fetchone()
+            if row:
+                _ids_by_name.set(drug_name.lower(), row[0])
+                return row[0]
+            return None
+        except Exception as e:
+            print('get_drug_id_by_name error:', e)
+            return None
+        finally:
+            cur.close()
+
+
+# Flipped to False the first time pg_trgm turns out to be missing (see
+# db/migrations/001_drugs_trigram_search.sql); search then uses plain LIKE.
+_trigram_search_available = True
+
+# Prefix matches rank first, then trigram similarity to the whole query.
+_RANKED_SEARCH_QUERY = """
+    SELECT drug_id, display_name,
+           (lower(display_name) LIKE %(prefix)s)::int + similarity(lower(display_name), %(term)s) AS score
+    FROM drugs
+    WHERE lower(display_name) LIKE %(contains)s OR lower(display_name) %% %(term)s
+    ORDER BY score DESC, display_name
+    LIMIT %(limit)s
+"""
 
-def get_drugs_by_search(query: str, limit: int = 10):
-    """Search the `drugs` table for display_name ILIKE %query% and return list of dicts.
+_SUBSTRING_SEARCH_QUERY = """
+    SELECT drug_id, display_name,
+           CASE WHEN lower(display_name) LIKE %(prefix)s THEN 1.0 ELSE 0.5 END AS score
+    FROM drugs
+    WHERE lower(display_name) LIKE %(contains)s
+    ORDER BY score DESC, display_name
+    LIMIT %(limit)s
+"""
 
-    Returns items like {'display_name': ..., 'drug_id': ...}.
+_ALPHABETICAL_SEARCH_QUERY = """
+    SELECT drug_id, display_name, NULL AS score
+    FROM drugs
+    WHERE lower(display_name) LIKE %(contains)s
+    ORDER BY display_name
+    LIMIT %(limit)s
+"""
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def get_drugs_by_search(query: str, limit: int = 10, ranked: bool = True):
+    """Search the `drugs` table by display name and return list of dicts.
+
+    Returns items like {'display_name': ..., 'drug_id': ..., 'score': ...}.
+    With `ranked` (the default) prefix matches come first, then names most
+    similar to the query (pg_trgm), which also catches small typos; `score`
+    is the relevance. Without pg_trgm it falls back to substring matches,
+    prefixes first. When a ranked search finds nothing, misspellings are
+    matched in memory by fuzzy_search_drugs. `ranked=False` gives the plain
+    alphabetical substring list.
     """
+    global _trigram_search_available
     if not query or not query.strip():
         return []
 
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT drug_id, display_name
-            FROM drugs
-            WHERE display_name ILIKE %s
-            ORDER BY display_name
-            LIMIT %s
-            """,
-            (f"%{query}%", limit)
-        )
-        rows = cur.fetchall()
-        results = []
-        for row in rows:
-            drug_id, display_name = row
-            results.append({'drug_id': drug_id, 'display_name': display_name})
-        return results
-    except Exception as e:
-        print('get_drugs_by_search error:', e)
-        return []
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+    term = query.strip().lower()
+    cache_key = (term, limit, ranked)
+    cached = _search_results.get(cache_key)
+    if cached is not None:
+        return [dict(item) for item in cached]
+
+    params = {
+        'term': term,
+        'prefix': _escape_like(term) + '%',
+        'contains': '%' + _escape_like(term) + '%',
+        'limit': limit,
+    }
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            if not ranked:
+                cur.execute(_ALPHABETICAL_SEARCH_QUERY, params)
+            elif _trigram_search_available:
+                try:
+                    cur.execute(_RANKED_SEARCH_QUERY, params)
+                except psycopg2.errors.UndefinedFunction:
+                    conn.rollback()
+                    _trigram_search_available = False
+                    print('get_drugs_by_search: pg_trgm not available, using substring search')
+                    cur.execute(_SUBSTRING_SEARCH_QUERY, params)
+            else:
+                cur.execute(_SUBSTRING_SEARCH_QUERY, params)
+            rows = cur.fetchall()
+        except Exception as e:
+            print('get_drugs_by_search error:', e)
+            return []
+        finally:
+            cur.close()
+
+    results = []
+    for drug_id, display_name, score in rows:
+        results.append({
+            'drug_id': drug_id,
+            'display_name': display_name,
+            'score': float(score) if score is not None else None,
+        })
+    _remember_drugs((row[0], row[1]) for row in rows)
+    if not results and ranked:
+        # Nothing close enough in SQL (or no pg_trgm): try harder misspellings in memory.
+        results = fuzzy_search_drugs(term, limit)
+    _search_results.set(cache_key, results)
+    return [dict(item) for item in results]
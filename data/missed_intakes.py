@@ -0,0 +1,47 @@
+"""Set-based logging of missed medication intakes.
+
+Shared by data.medication_log.log_missed_intakes_for_day (one user) and the
+cron job jobs/missed_intake_sweeper.py (everyone), so it must not import
+Streamlit.
+"""
+from datetime import datetime, time, timedelta
+
+# Key space of the per-day advisory lock (the day's ordinal is the second key).
+_LOCK_NAMESPACE = 0x4D49
+
+_MISSED_INTAKES_QUERY = '''
+    INSERT INTO medication_intake_log (patient_med_id, taken, taken_time)
+    SELECT pm.patient_med_id, FALSE, %(end_of_day)s
+    FROM patient_medications pm
+    WHERE pm.start_date <= %(day)s
+      AND (pm.end_date IS NULL OR pm.end_date >= %(day)s)
+      {user_filter}
+      AND NOT EXISTS (
+          SELECT 1 FROM medication_intake_log l
+          WHERE l.patient_med_id = pm.patient_med_id
+            AND l.taken_time >= %(day_start)s AND l.taken_time < %(next_day)s
+      )
+'''
+
+
+def insert_missed_intakes_for_day(cur, day, user_id=None):
+    """Insert the day's missed rows (for one user, or everyone); return how many.
+
+    A missed row (taken = FALSE at 23:59:59) is added for every medication
+    active on `day` with no intake log that day, so running it again adds
+    nothing. Concurrent runs for the same day (the sweeper and a user's page)
+    are serialized with a transaction-level advisory lock, so the second one
+    sees the first one's rows. Does not commit.
+    """
+    cur.execute('SELECT pg_advisory_xact_lock(%s, %s)', (_LOCK_NAMESPACE, day.toordinal()))
+    day_start = datetime.combine(day, time.min)
+    params = {
+        'day': day,
+        'day_start': day_start,
+        'next_day': day_start + timedelta(days=1),
+        'end_of_day': datetime.combine(day, time(23, 59, 59)),
+        'user_id': user_id,
+    }
+    user_filter = 'AND pm.user_id = %(user_id)s' if user_id is not None else ''
+    cur.execute(_MISSED_INTAKES_QUERY.format(user_filter=user_filter), params)
+    return cur.rowcount
@@ -0,0 +1,188 @@
+"""Push-based notification counters via PostgreSQL LISTEN/NOTIFY.
+
+Writes that change a user's badge (medication requests, doctor notes, side
+effect reports) call `notify()` inside their transaction, so PostgreSQL
+delivers the event only if it commits. One background thread per process
+LISTENs on a dedicated connection and keeps per-user counters in memory;
+`get_notification_counts()` reads them without touching the database.
+
+A user's counters are seeded from the trigger-maintained
+user_notification_counters table the first time they are read and then
+maintained from events. An event committed while a user is being seeded can
+be missed, so counters are also reseeded every NOTIFICATIONS_RESEED seconds.
+If the listener loses its connection all counters are dropped and reseeded
+on next read. Set NOTIFICATIONS_PUSH=0 to do the table read on every call
+instead.
+"""
+import json
+import os
+import select
+import threading
+import time
+
+import psycopg2.errors
+
+from db.database import connect, get_connection
+
+CHANNEL = 'medipal_notifications'
+COUNTERS = ('medication_requests', 'unread_notes', 'side_effect_reports')
+
+PUSH_ENABLED = os.getenv('NOTIFICATIONS_PUSH', '1') != '0'
+RESEED_AFTER = float(os.getenv('NOTIFICATIONS_RESEED', '300'))
+_RECONNECT_DELAY = 5.0
+
+# Flipped to False the first time user_notification_counters turns out to be missing.
+_counters_table_available = True
+
+
+def notify(cur, counter, user_id, delta=1):
+    """Queue a counter change for `user_id`; sent when the cursor's transaction commits."""
+    if counter not in COUNTERS:
+        raise ValueError(f"unknown notification counter {counter!r}")
+    payload = json.dumps({'counter': counter, 'user_id': user_id, 'delta': delta})
+    cur.execute('SELECT pg_notify(%s, %s)', (CHANNEL, payload))
+
+
+def _count_from_sources(user_id):
+    from data.medication_requests import get_pending_requests_count
+    from data.side_effect_requests import get_unread_doctor_notes_for_patient
+    from data.patient_side_effect import get_side_effect_reports_count
+    return {
+        'medication_requests': get_pending_requests_count(user_id),
+        'unread_notes': get_unread_doctor_notes_for_patient(user_id),
+        'side_effect_reports': get_side_effect_reports_count(user_id),
+    }
+
+
+def _query_counts(user_id):
+    """Read a user's counters from user_notification_counters (one primary-key lookup).
+
+    The table is maintained by triggers (db/migrations/004_user_notification_counters.sql);
+    until that migration is applied the three source tables are counted instead.
+    """
+    global _counters_table_available
+    if not _counters_table_available:
+        return _count_from_sources(user_id)
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'SELECT medication_requests, unread_notes, side_effect_reports '
+                    'FROM user_notification_counters WHERE user_id = %s',
+                    (user_id,)
+                )
+                row = cur.fetchone()
+        except psycopg2.errors.UndefinedTable:
+            conn.rollback()
+            _counters_table_available = False
+            print('get_notification_counts: user_notification_counters missing, counting source tables')
+            return _count_from_sources(user_id)
+        except Exception as e:
+            print('get_notification_counts error:', e)
+            return dict.fromkeys(COUNTERS, 0)
+    return dict(zip(COUNTERS, row)) if row else dict.fromkeys(COUNTERS, 0)
+
+
+class NotificationListener:
+    """Background LISTEN loop maintaining {user_id: {counter: value}}."""
+
+    def __init__(self, seed=_query_counts):
+        self._seed = seed
+        self._counts = {}
+        self._seeded_at = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._connected = threading.Event()
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name='notification-listener', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def counts(self, user_id):
+        """Return the user's counters, seeding them from the database on first read."""
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is not None and time.monotonic() - self._seeded_at[user_id] < RESEED_AFTER:
+                return dict(counts)
+        seeded = self._seed(user_id)
+        with self._lock:
+            # Only cache while listening; otherwise events would be missed.
+            if self._connected.is_set():
+                self._counts[user_id] = seeded
+                self._seeded_at[user_id] = time.monotonic()
+                return dict(seeded)
+        return seeded
+
+    def apply(self, payload):
+        """Apply one NOTIFY payload to a seeded user (others seed fresh later)."""
+        try:
+            event = json.loads(payload)
+            user_id, counter, delta = event['user_id'], event['counter'], int(event['delta'])
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is not None and counter in counts:
+                counts[counter] = max(0, counts[counter] + delta)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = connect()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {CHANNEL}')
+                self._connected.set()
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.apply(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print('notification listener error:', e)
+            finally:
+                self._connected.clear()
+                with self._lock:
+                    self._counts.clear()
+                    self._seeded_at.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stopped.wait(_RECONNECT_DELAY)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_listener():
+    """Return the process-wide NotificationListener, starting it on first use."""
+    global _listener
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                _listener = NotificationListener().start()
+    return _listener
+
+
+def get_notification_counts(user_id):
+    """Return {'medication_requests', 'unread_notes', 'side_effect_reports'} for a user."""
+    if not PUSH_ENABLED:
+        return _query_counts(user_id)
+    return get_listener().counts(user_id)
@@ -29,41 +29,33 @@ def _build_med_dict(row, include_status=True):
 
 def _execute_med_query(query, params, include_status=True):
 	"""Execute medication query and return list of dicts."""
-	conn = get_connection()
-	meds = []
-	try:
-		with conn.cursor() as cur:
-			cur.execute(query, params)
-			meds = [_build_med_dict(row, include_status) for row in cur.fetchall()]
-	except Exception as e:
-		st.session_state['db_fetch_error'] = str(e)
-	finally:
-		conn.close()
+	with get_connection() as conn:
+		meds = []
+		try:
+			with conn.cursor() as cur:
+				cur.execute(query, params)
+				meds = [_build_med_dict(row, include_status) for row in cur.fetchall()]
+		except Exception as e:
+			st.session_state['db_fetch_error'] = str(e)
 	return meds
 
 
 def update_patient_medication(patient_med_id, dose, instructions, start_date, end_date, prescribed_by, timing):
 	"""Update an existing patient medication entry by ID."""
-	conn = get_connection()
-	if not conn:
-		st.session_state['db_update_error'] = "Failed to connect to database"
-		return False
-	
-	try:
-		with conn.cursor() as cur:
-			cur.execute('''
-				UPDATE patient_medications
-				SET dose = %s, instructions = %s, start_date = %s, end_date = %s, prescribed_by = %s, timing = %s
-				WHERE patient_med_id = %s
-			''', (dose, instructions, start_date, end_date, prescribed_by, timing, patient_med_id))
-			conn.commit()
-		return True
-	except Exception as e:
-		st.session_state['db_update_error'] = str(e)
-		conn.rollback()
-		return False
-	finally:
-		conn.close()
+	with get_connection() as conn:
+		try:
+			with conn.cursor() as cur:
+				cur.execute('''
+					UPDATE patient_medications
+					SET dose = %s, instructions = %s, start_date = %s, end_date = %s, prescribed_by = %s, timing = %s
+					WHERE patient_med_id = %s
+				''', (dose, instructions, start_date, end_date, prescribed_by, timing, patient_med_id))
+				conn.commit()
+			return True
+		except Exception as e:
+			st.session_state['db_update_error'] = str(e)
+			conn.rollback()
+			return False
 def get_all_patient_medication_entries(user_id):
 	"""Return all medication entries for a user (not distinct by drug_id)."""
 	query = '''
@@ -142,8 +134,7 @@ from db.database import get_connection
 import streamlit as st
 
 def insert_patient_medication(user_id, drug_id, dose, instructions, start_date, end_date, prescribed_by, timing):
-	conn = get_connection()
-	try:
+	with get_connection() as conn:
 		with conn.cursor() as cur:
 			try:
 				cur.execute('''
@@ -154,25 +145,21 @@ def insert_patient_medication(user_id, drug_id, dose, instructions, start_date,
 			except Exception as e:
 				st.session_state['db_insert_error'] = str(e)
 				conn.rollback()
-	finally:
-		conn.close()
 
 def get_patient_medication_entry_by_id(patient_med_id):
     """
     Fetch a single patient_medication entry by its id.
     """
     from db.database import get_connection
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patient_medications WHERE patient_med_id = %s", (patient_med_id,))
-    row = cur.fetchone()
-    if row:
-        # Map columns to dict keys (adjust as needed for your schema)
-        columns = [desc[0] for desc in cur.description]
-        entry = dict(zip(columns, row))
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM patient_medications WHERE patient_med_id = %s", (patient_med_id,))
+        row = cur.fetchone()
+        if row:
+            # Map columns to dict keys (adjust as needed for your schema)
+            columns = [desc[0] for desc in cur.description]
+            entry = dict(zip(columns, row))
+            cur.close()
+            return entry
         cur.close()
-        conn.close()
-        return entry
-    cur.close()
-    conn.close()
     return None
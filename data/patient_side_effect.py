@@ -1,4 +1,12 @@
+import os
+
 from db.database import get_connection
+from data.notifications import notify
+from utils.cache import TTLCache
+
+# Header analytics per user; short-lived and dropped whenever the user's
+# reports change (insert/resolve), so it only saves work across reruns.
+_analytics_cache = TTLCache(maxsize=4096, ttl=float(os.getenv('SIDE_EFFECT_ANALYTICS_TTL', '30')))
 
 
 def _build_report_dict(row, include_rarity=False):
@@ -41,24 +49,22 @@ def _build_report_dict(row, include_rarity=False):
 
 def _execute_report_query(query, params, single=False, include_rarity=False):
     """Execute a query and return report dict(s)."""
-    conn = get_connection()
-    result = None if single else []
+    with get_connection() as conn:
+        result = None if single else []
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
             
-            if single:
-                row = cur.fetchone()
-                if row:
-                    result = _build_report_dict(row, include_rarity)
-            else:
-                results = cur.fetchall()
-                result = [_build_report_dict(row, include_rarity) for row in results]
-    except Exception as e:
-        print(f"Error executing report query: {e}")
-    finally:
-        conn.close()
+                if single:
+                    row = cur.fetchone()
+                    if row:
+                        result = _build_report_dict(row, include_rarity)
+                else:
+                    results = cur.fetchall()
+                    result = [_build_report_dict(row, include_rarity) for row in results]
+        except Exception as e:
+            print(f"Error executing report query: {e}")
     
     return result
 
@@ -98,28 +104,28 @@ def insert_side_effect_report(user_id, side_effect_id, severity, notes, patient_
     Returns:
         report_id of the newly inserted report, or None if failed
     """
-    conn = get_connection()
-    report_id = None
+    with get_connection() as conn:
+        report_id = None
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                INSERT INTO patient_side_effects 
-                (user_id, patient_med_id, side_effect_id, severity, notes)
-                VALUES (%s, %s, %s, %s, %s)
-                RETURNING report_id
-            ''', (user_id, patient_med_id, side_effect_id, severity, notes))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    INSERT INTO patient_side_effects 
+                    (user_id, patient_med_id, side_effect_id, severity, notes)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING report_id
+                ''', (user_id, patient_med_id, side_effect_id, severity, notes))
             
-            result = cur.fetchone()
-            if result:
-                report_id = result[0]
+                result = cur.fetchone()
+                if result:
+                    report_id = result[0]
+                    notify(cur, 'side_effect_reports', user_id)
             
-            conn.commit()
-    except Exception as e:
-        print(f"Error inserting side effect report: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+                conn.commit()
+                _analytics_cache.pop(user_id)
+        except Exception as e:
+            print(f"Error inserting side effect report: {e}")
+            conn.rollback()
     
     return report_id
 
@@ -157,28 +163,81 @@ def get_resolved_patient_side_effect_reports(user_id):
     return _execute_report_query(query, (user_id,))
 
 
+_STATUS_FILTERS = {
+    'all': '',
+    'active': 'AND (pse.resolved = FALSE OR pse.resolved IS NULL)',
+    'resolved': 'AND pse.resolved = TRUE',
+}
+
+
+def get_patient_side_effect_reports_page(user_id, status='all', page_size=20, after=None, include_notes=False):
+    """
+    Get one page of a patient's side effect reports, newest first.
+    
+    Args:
+        user_id: Patient's user ID
+        status: 'all', 'active' or 'resolved'
+        page_size: Maximum number of reports to return
+        after: Cursor returned with the previous page, or None for the first page
+        include_notes: Also load each report's doctor notes (report['doctor_notes'])
+    
+    Returns:
+        (reports, next_cursor); next_cursor is None on the last page.
+        Reports with no reported_at come last.
+    """
+    status_filter = _STATUS_FILTERS[status.lower()]
+    params = [user_id]
+    keyset = ''
+    if after is not None:
+        # Reports without a reported_at sort after all dated ones.
+        after_reported_at, after_report_id = after
+        if after_reported_at is None:
+            keyset = 'AND pse.reported_at IS NULL AND pse.report_id < %s'
+            params.append(after_report_id)
+        else:
+            keyset = 'AND ((pse.reported_at, pse.report_id) < (%s, %s) OR pse.reported_at IS NULL)'
+            params.extend((after_reported_at, after_report_id))
+    params.append(page_size + 1)
+    query = _BASE_REPORT_QUERY + f'''
+        WHERE pse.user_id = %s {status_filter} {keyset}
+        ORDER BY pse.reported_at DESC NULLS LAST, pse.report_id DESC
+        LIMIT %s
+    '''
+    reports = _execute_report_query(query, tuple(params))
+    cursor = None
+    if len(reports) > page_size:
+        reports = reports[:page_size]
+        cursor = (reports[-1]['reported_at'], reports[-1]['report_id'])
+    if include_notes:
+        from data.side_effect_requests import attach_doctor_notes
+        attach_doctor_notes(reports)
+    return reports, cursor
+
+
 def resolve_side_effect_report(report_id):
     """
     Mark a side effect report as resolved.
     """
-    conn = get_connection()
+    with get_connection() as conn:
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                UPDATE patient_side_effects
-                SET resolved = TRUE
-                WHERE report_id = %s
-            ''', (report_id,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    UPDATE patient_side_effects
+                    SET resolved = TRUE
+                    WHERE report_id = %s
+                    RETURNING user_id
+                ''', (report_id,))
+                row = cur.fetchone()
             
-            conn.commit()
-            return True
-    except Exception as e:
-        print(f"Error resolving side effect report: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
+                conn.commit()
+                if row:
+                    _analytics_cache.pop(row[0])
+                return True
+        except Exception as e:
+            print(f"Error resolving side effect report: {e}")
+            conn.rollback()
+            return False
 
 
 def get_recent_patient_side_effect_reports(user_id, limit=3):
@@ -218,95 +277,69 @@ def get_side_effect_reports_count(user_id):
     Returns:
         Integer count of total reports.
     """
-    conn = get_connection()
-    count = 0
+    with get_connection() as conn:
+        count = 0
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT COUNT(*) 
-                FROM patient_side_effects 
-                WHERE user_id = %s
-            ''', (user_id,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT COUNT(*) 
+                    FROM patient_side_effects 
+                    WHERE user_id = %s
+                ''', (user_id,))
             
-            result = cur.fetchone()
-            if result:
-                count = result[0]
-    except Exception as e:
-        print(f"Error fetching side effect reports count: {e}")
-    finally:
-        conn.close()
+                result = cur.fetchone()
+                if result:
+                    count = result[0]
+        except Exception as e:
+            print(f"Error fetching side effect reports count: {e}")
     
     return count
 
 
-def get_patient_side_effect_analytics(user_id):
+def get_patient_side_effect_analytics(user_id, use_cache=True):
     """
-    Get analytics for patient's side effect reports.
+    Get analytics for patient's side effect reports in a single query.
     
     Args:
         user_id: Patient's user ID
+        use_cache: Serve a result up to SIDE_EFFECT_ANALYTICS_TTL seconds old
     
     Returns:
-        Dict with analytics: total_reports, active_reports, healthcare_notified, severe_reports
+        Dict with analytics: total_reports, active_reports, medications_affected, severe_reports
     """
-    conn = get_connection()
-    analytics = {
-        'total_reports': 0,
-        'active_reports': 0,
-        'medications_affected': 0,
-        'severe_reports': 0
-    }
+    if use_cache:
+        cached = _analytics_cache.get(user_id)
+        if cached is not None:
+            return dict(cached)
     
-    try:
-        with conn.cursor() as cur:
-            # Total reports count
-            cur.execute('''
-                SELECT COUNT(*) 
-                FROM patient_side_effects 
-                WHERE user_id = %s
-            ''', (user_id,))
-            result = cur.fetchone()
-            if result:
-                analytics['total_reports'] = result[0]
-            
-            # Active reports (unresolved)
-            cur.execute('''
-                SELECT COUNT(*) 
-                FROM patient_side_effects 
-                WHERE user_id = %s AND (resolved = FALSE OR resolved IS NULL)
-            ''', (user_id,))
-            result = cur.fetchone()
-            if result:
-                analytics['active_reports'] = result[0]
-            
-            # Medications affected (count distinct medications with reports)
-            cur.execute('''
-                SELECT COUNT(DISTINCT pm.drug_id)
-                FROM patient_side_effects pse
-                INNER JOIN patient_medications pm ON pse.patient_med_id = pm.patient_med_id
-                WHERE pse.user_id = %s
-            ''', (user_id,))
-            result = cur.fetchone()
-            if result:
-                analytics['medications_affected'] = result[0]
-            
-            # Severe reports (rare side effects - frequency <= 0.2)
-            cur.execute('''
-                SELECT COUNT(*)
-                FROM patient_side_effects pse
-                LEFT JOIN patient_medications pm ON pse.patient_med_id = pm.patient_med_id
-                LEFT JOIN drugs d ON pm.drug_id = d.drug_id
-                LEFT JOIN drug_side_effects dse ON (dse.drug_id = d.drug_id AND dse.side_effect_id = pse.side_effect_id)
-                WHERE pse.user_id = %s AND dse.average_frequency <= 0.2
-            ''', (user_id,))
-            result = cur.fetchone()
-            if result:
-                analytics['severe_reports'] = result[0]
-            
-    except Exception as e:
-        print(f"Error fetching side effect analytics: {e}")
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        analytics = {
+            'total_reports': 0,
+            'active_reports': 0,
+            'medications_affected': 0,
+            'severe_reports': 0
+        }
+    
+        try:
+            with conn.cursor() as cur:
+                # Severe = rare side effect for the reported drug (frequency <= 0.2)
+                cur.execute('''
+                    SELECT
+                        COUNT(*),
+                        COUNT(*) FILTER (WHERE pse.resolved = FALSE OR pse.resolved IS NULL),
+                        COUNT(DISTINCT pm.drug_id),
+                        COUNT(*) FILTER (WHERE dse.average_frequency <= 0.2)
+                    FROM patient_side_effects pse
+                    LEFT JOIN patient_medications pm ON pse.patient_med_id = pm.patient_med_id
+                    LEFT JOIN drug_side_effects dse ON (dse.drug_id = pm.drug_id AND dse.side_effect_id = pse.side_effect_id)
+                    WHERE pse.user_id = %s
+                ''', (user_id,))
+                result = cur.fetchone()
+                if result:
+                    analytics = dict(zip(analytics, result))
+                _analytics_cache.set(user_id, dict(analytics))
+        except Exception as e:
+            print(f"Error fetching side effect analytics: {e}")
     
     return analytics
@@ -0,0 +1,47 @@
+from db.database import get_connection
+
+
+def get_drug_safety_signals(drug_ids, signals_only=True, limit=20):
+    """Get population PRR/ROR statistics for drugs from drug_safety_signals.
+
+    Rows are written by `python -m jobs.signal_detection`. Returns a list of
+    dicts ordered by PRR descending (at most `limit` per call); empty if the
+    job has not run yet.
+    """
+    drug_ids = list({drug_id for drug_id in drug_ids if drug_id is not None})
+    if not drug_ids:
+        return []
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT dss.drug_id, dss.side_effect_id, se.pt_name, dss.report_count,
+                           dss.prr, dss.prr_lower, dss.prr_upper,
+                           dss.ror, dss.ror_lower, dss.ror_upper,
+                           dss.chi_square, dss.is_signal, dss.computed_at
+                    FROM drug_safety_signals dss
+                    LEFT JOIN side_effects se ON se.meddra_id = dss.side_effect_id
+                    WHERE dss.drug_id = ANY(%s) AND (dss.is_signal OR NOT %s)
+                    ORDER BY dss.prr DESC NULLS LAST
+                    LIMIT %s
+                ''', (drug_ids, signals_only, limit))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"Error fetching drug safety signals: {e}")
+            return []
+    return [
+        {
+            'drug_id': row[0],
+            'side_effect_id': row[1],
+            'side_effect_name': row[2],
+            'report_count': row[3],
+            'prr': row[4],
+            'prr_ci': (row[5], row[6]),
+            'ror': row[7],
+            'ror_ci': (row[8], row[9]),
+            'chi_square': row[10],
+            'is_signal': row[11],
+            'computed_at': row[12],
+        }
+        for row in rows
+    ]
@@ -1,63 +1,162 @@
+import os
+import threading
+
 from db.database import get_connection
+from data.side_effect_matrix import SideEffectMatrix, get_side_effect_matrix, invalidate_side_effect_matrix
+from utils.cache import TTLCache
+from utils.fuzzy_search import FuzzyIndex
+
+_fuzzy_index = None
+_fuzzy_index_lock = threading.Lock()
+
+# Side effect frequencies are reference data; profiles are cached per drug_id.
+_profiles = TTLCache(
+	maxsize=int(os.getenv('SIDE_EFFECT_CACHE_SIZE', '4096')),
+	ttl=float(os.getenv('SIDE_EFFECT_CACHE_TTL', '3600')),
+)
+
+# Serve per-drug lookups from the in-memory SideEffectMatrix ('0' to query per drug).
+_USE_MATRIX = os.getenv('SIDE_EFFECT_MATRIX', '1') != '0'
+
+# (min, max] average_frequency bounds of each rarity bucket.
+RARITY_BOUNDS = {
+	'common': (0.5, 1.0),
+	'uncommon': (0.2, 0.5),
+	'rare': (0.0, 0.2),
+}
 
 def _execute_query(query, params=None, fetch_one=False):
 	"""Execute query and return results as list of dicts or single dict."""
-	conn = get_connection()
-	results = [] if not fetch_one else None
+	with get_connection() as conn:
+		results = [] if not fetch_one else None
 	
-	try:
-		with conn.cursor() as cur:
-			cur.execute(query, params or ())
-			rows = cur.fetchall()
+		try:
+			with conn.cursor() as cur:
+				cur.execute(query, params or ())
+				rows = cur.fetchall()
 			
-			if fetch_one:
-				results = rows[0] if rows else None
-			else:
-				results = rows
-	except Exception as e:
-		print(f"Error executing query: {e}")
-	finally:
-		conn.close()
+				if fetch_one:
+					results = rows[0] if rows else None
+				else:
+					results = rows
+		except Exception as e:
+			print(f"Error executing query: {e}")
 	
 	return results
 
 
+def _rarity(frequency):
+	if frequency is None:
+		return None
+	for rarity, (freq_min, freq_max) in RARITY_BOUNDS.items():
+		if freq_min < frequency <= freq_max:
+			return rarity
+	return None
+
+
+def get_side_effect_profile(drug_id):
+	"""Get all side effects for a drug, plus common/uncommon/rare buckets.
+
+	Read from the in-memory SideEffectMatrix, or with a single query when it
+	is disabled or cannot be loaded. Returns {'all': [...], 'common': [...], 'uncommon': [...], 'rare': [...]},
+	each a list of {'pt_name', 'average_frequency'} ordered by frequency
+	descending. Cached per drug_id; a failed query gives empty buckets that
+	are not cached.
+	"""
+	profile = _profiles.get(drug_id)
+	if profile is None:
+		matrix = get_side_effect_matrix() if _USE_MATRIX else None
+		if matrix is not None:
+			effects = matrix.side_effects_for(drug_id)
+		else:
+			effects = _fetch_side_effects(drug_id)
+		if effects is None:
+			return {'all': [], 'common': [], 'uncommon': [], 'rare': []}
+		profile = {'all': effects, 'common': [], 'uncommon': [], 'rare': []}
+		for effect in effects:
+			rarity = _rarity(effect['average_frequency'])
+			if rarity:
+				profile[rarity].append(effect)
+		_profiles.set(drug_id, profile)
+	return {bucket: list(effects) for bucket, effects in profile.items()}
+
+
+def _fetch_side_effects(drug_id):
+	"""Return a drug's side effects, most frequent first, or None if the query failed."""
+	with get_connection() as conn:
+		try:
+			with conn.cursor() as cur:
+				cur.execute('''
+					SELECT se.pt_name, dse.average_frequency
+					FROM drug_side_effects dse
+					JOIN side_effects se ON dse.side_effect_id = se.meddra_id
+					WHERE dse.drug_id = %s
+					ORDER BY dse.average_frequency DESC
+				''', (drug_id,))
+				rows = cur.fetchall()
+		except Exception as e:
+			print(f"Error fetching side effects for drug {drug_id}: {e}")
+			return None
+	return [{'pt_name': row[0], 'average_frequency': row[1]} for row in rows]
+
+
+def invalidate_side_effect_profiles():
+	"""Forget cached side effect profiles (call after changing drug_side_effects)."""
+	_profiles.invalidate()
+	invalidate_side_effect_matrix()
+
+
 def get_sideeffects_by_rarity(drug_id, rarity='common'):
 	"""Get side effects by rarity for a drug."""
-	# Set frequency bounds based on rarity
-	if rarity == 'common':
-		freq_min, freq_max = 0.5, 1.0
-	elif rarity == 'uncommon':
-		freq_min, freq_max = 0.2, 0.5
-	elif rarity == 'rare':
-		freq_min, freq_max = 0.0, 0.2
-	else:
+	if rarity not in RARITY_BOUNDS:
 		raise ValueError("rarity must be 'common', 'uncommon', or 'rare'")
-	
-	query = '''
-		SELECT se.pt_name, dse.average_frequency
-		FROM drug_side_effects dse
-		JOIN side_effects se ON dse.side_effect_id = se.meddra_id
-		WHERE dse.drug_id = %s AND dse.average_frequency > %s AND dse.average_frequency <= %s
-		ORDER BY dse.average_frequency DESC
-	'''
-	
-	rows = _execute_query(query, (drug_id, freq_min, freq_max))
-	return [{'pt_name': row[0], 'average_frequency': row[1]} for row in rows]
+	return get_side_effect_profile(drug_id)[rarity]
 
 
 def get_all_sideeffects_for_drug(drug_id):
 	"""Get all side effects for a drug."""
-	query = '''
-		SELECT se.pt_name, dse.average_frequency
-		FROM drug_side_effects dse
-		JOIN side_effects se ON dse.side_effect_id = se.meddra_id
-		WHERE dse.drug_id = %s
-		ORDER BY dse.average_frequency DESC
-	'''
-	
-	rows = _execute_query(query, (drug_id,))
-	return [{'pt_name': row[0], 'average_frequency': row[1]} for row in rows]
+	return get_side_effect_profile(drug_id)['all']
+
+
+def _matrix_for_drugs(drug_ids):
+	"""Build a SideEffectMatrix over just these drugs (when the full one is unavailable)."""
+	rows = _execute_query('''
+		SELECT drug_id, side_effect_id, average_frequency
+		FROM drug_side_effects
+		WHERE drug_id = ANY(%s)
+		ORDER BY drug_id, average_frequency DESC NULLS LAST
+	''', (drug_ids,))
+	side_effects = _execute_query('''
+		SELECT meddra_id, pt_name
+		FROM side_effects
+		WHERE meddra_id IN (SELECT side_effect_id FROM drug_side_effects WHERE drug_id = ANY(%s))
+	''', (drug_ids,))
+	return SideEffectMatrix.from_rows(rows, side_effects)
+
+
+def get_regimen_side_effect_risk(drug_ids, limit=50, min_probability=0.0):
+	"""Expected side effects of taking several drugs together, most likely first.
+
+	Returns a list of {'meddra_id', 'pt_name', 'probability', 'contributors'}
+	where probability is 1 - prod(1 - p) over the drugs listing the effect
+	and contributors is a list of {'drug_id', 'frequency'}, highest first.
+	"""
+	drug_ids = list(dict.fromkeys(d for d in drug_ids if d is not None))
+	if not drug_ids:
+		return []
+	matrix = get_side_effect_matrix() if _USE_MATRIX else None
+	if matrix is None:
+		matrix = _matrix_for_drugs(drug_ids)
+	indices, probabilities, contributors = matrix.combined_risk(drug_ids, min_probability, limit)
+	return [
+		{
+			'meddra_id': int(matrix.meddra_ids[j]),
+			'pt_name': matrix.pt_names[j],
+			'probability': probability,
+			'contributors': [{'drug_id': drug_id, 'frequency': frequency} for drug_id, frequency in drugs],
+		}
+		for j, probability, drugs in zip(indices.tolist(), probabilities.tolist(), contributors)
+	]
 
 
 def search_all_side_effects(search_term=''):
@@ -81,9 +180,32 @@ def search_all_side_effects(search_term=''):
 		params = None
 	
 	rows = _execute_query(query, params)
+	if not rows and search_term:
+		return fuzzy_search_side_effects(search_term)
 	return [row[0] for row in rows]
 
 
+def get_side_effect_fuzzy_index():
+	"""Return the process-wide FuzzyIndex over side effect names, built on first use."""
+	global _fuzzy_index
+	if _fuzzy_index is not None:
+		return _fuzzy_index
+	with _fuzzy_index_lock:
+		if _fuzzy_index is None:
+			rows = _execute_query('SELECT meddra_id, pt_name FROM side_effects')
+			if rows:
+				_fuzzy_index = FuzzyIndex(rows)
+	return _fuzzy_index
+
+
+def fuzzy_search_side_effects(search_term, limit=50):
+	"""Typo-tolerant side effect name search, closest first."""
+	index = get_side_effect_fuzzy_index()
+	if index is None:
+		return []
+	return [name for _, name, _ in index.search(search_term, limit)]
+
+
 def get_side_effect_id_by_name(pt_name):
 	"""Get meddra_id for a side effect by PT name."""
 	query = '''
@@ -0,0 +1,124 @@
+"""Rank which of a patient's medications most likely caused a side effect.
+
+A medication's score is the drug's known frequency for the effect
+(drug_side_effects.average_frequency, or a small prior when the drug does not
+list it) times a temporal weight that is highest for drugs started just
+before the effect and decays with a half-life towards a floor, since
+long-standing drugs can still cause new effects. Scores are normalised into
+shares of the candidates.
+"""
+import os
+from datetime import date, datetime
+
+from db.database import get_connection
+
+SUSPECT_HALF_LIFE_DAYS = float(os.getenv('SUSPECT_HALF_LIFE_DAYS', '30'))
+# Temporal weight never drops below this for drugs started long ago.
+SUSPECT_TIME_FLOOR = 0.1
+# Frequency assumed for a drug that does not list the effect at all.
+UNLISTED_FREQUENCY = 0.001
+
+
+def _as_date(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _temporal_weight(days_on_drug):
+    if days_on_drug is None:
+        return SUSPECT_TIME_FLOOR
+    if days_on_drug < 0:
+        return 0.0
+    decay = 0.5 ** (days_on_drug / SUSPECT_HALF_LIFE_DAYS)
+    return SUSPECT_TIME_FLOOR + (1 - SUSPECT_TIME_FLOOR) * decay
+
+
+def _rank(candidates, reported_on):
+    """Score (patient_med_id, drug_id, start_date, frequency) rows; best first."""
+    suspects = []
+    for patient_med_id, drug_id, start_date, frequency in candidates:
+        days_on_drug = (reported_on - start_date).days if start_date else None
+        listed_frequency = float(frequency) if frequency is not None else None
+        score = (listed_frequency or UNLISTED_FREQUENCY) * _temporal_weight(days_on_drug)
+        suspects.append({
+            'patient_med_id': patient_med_id,
+            'drug_id': drug_id,
+            'frequency': listed_frequency,
+            'days_on_drug': days_on_drug,
+            'score': score,
+        })
+    total = sum(s['score'] for s in suspects)
+    for s in suspects:
+        s['share'] = s['score'] / total if total else 0.0
+    suspects.sort(key=lambda s: (-s['score'], s['patient_med_id']))
+    return suspects
+
+
+def rank_suspect_medications(side_effect_id, patient_med_ids, reported_at=None):
+    """Rank the given patient medications as causes of one side effect.
+
+    Returns a list of {'patient_med_id', 'drug_id', 'frequency', 'days_on_drug',
+    'score', 'share'}, most likely first.
+    """
+    patient_med_ids = list(dict.fromkeys(patient_med_ids))
+    if not side_effect_id or not patient_med_ids:
+        return []
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT pm.patient_med_id, pm.drug_id, pm.start_date, dse.average_frequency
+                    FROM patient_medications pm
+                    LEFT JOIN drug_side_effects dse
+                        ON dse.drug_id = pm.drug_id AND dse.side_effect_id = %s
+                    WHERE pm.patient_med_id = ANY(%s)
+                ''', (side_effect_id, patient_med_ids))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"Error ranking suspect medications: {e}")
+            return []
+    return _rank(rows, _as_date(reported_at))
+
+
+def get_report_attributions(report_ids):
+    """Rank suspect medications for many side effect reports in one query.
+
+    Candidates for a report are the patient's medications active on the day
+    it was reported. Returns {report_id: [suspect, ...]} as in
+    rank_suspect_medications; reports without candidates map to [].
+    """
+    report_ids = list(dict.fromkeys(report_ids))
+    if not report_ids:
+        return {}
+    with get_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT pse.report_id, pse.reported_at,
+                           pm.patient_med_id, pm.drug_id, pm.start_date, dse.average_frequency
+                    FROM patient_side_effects pse
+                    JOIN patient_medications pm
+                        ON pm.user_id = pse.user_id
+                        AND pm.start_date <= pse.reported_at::date
+                        AND (pm.end_date IS NULL OR pm.end_date >= pse.reported_at::date)
+                    LEFT JOIN drug_side_effects dse
+                        ON dse.drug_id = pm.drug_id AND dse.side_effect_id = pse.side_effect_id
+                    WHERE pse.report_id = ANY(%s)
+                ''', (report_ids,))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"Error fetching report attributions: {e}")
+            return {report_id: [] for report_id in report_ids}
+
+    candidates = {}
+    reported = {}
+    for report_id, reported_at, patient_med_id, drug_id, start_date, frequency in rows:
+        reported[report_id] = _as_date(reported_at)
+        candidates.setdefault(report_id, []).append((patient_med_id, drug_id, start_date, frequency))
+    return {
+        report_id: _rank(candidates[report_id], reported[report_id]) if report_id in candidates else []
+        for report_id in report_ids
+    }
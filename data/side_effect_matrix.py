@@ -0,0 +1,211 @@
+"""The whole drug_side_effects table as a compact sparse matrix.
+
+Rows are drugs, columns are MedDRA preferred terms, values are
+average_frequency as float32 (NaN where unknown), stored in CSR form:
+
+    indptr[i]:indptr[i + 1]   slice of drug i's entries
+    indices[k]                column (side effect) index of entry k
+    frequencies[k]            frequency of entry k
+
+Within a row entries are ordered by frequency, highest first, so per-drug
+lookups need no sorting and slices are zero-copy views. At 8 bytes per
+(drug, side effect) pair plus the id maps, millions of pairs fit in tens of MB.
+"""
+import os
+import threading
+import time
+from array import array
+
+import numpy as np
+
+from db.database import get_connection
+
+_FETCH_SIZE = 50000
+
+# After a failed load, callers get None (and use their per-drug queries) for
+# this many seconds before the full-table load is tried again.
+RETRY_AFTER = float(os.getenv('SIDE_EFFECT_MATRIX_RETRY', '300'))
+
+
+class SideEffectMatrix:
+    """CSR drug x side effect frequency matrix with id <-> index maps."""
+
+    def __init__(self, drug_ids, indptr, indices, frequencies, meddra_ids, pt_names):
+        self.drug_ids = np.asarray(drug_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.frequencies = np.asarray(frequencies, dtype=np.float32)
+        self.meddra_ids = np.asarray(meddra_ids, dtype=np.int64)
+        self.pt_names = list(pt_names)
+        self._drug_index = {int(d): i for i, d in enumerate(self.drug_ids)}
+        self._meddra_index = {int(m): j for j, m in enumerate(self.meddra_ids)}
+
+    @classmethod
+    def from_rows(cls, rows, side_effects):
+        """Build from (drug_id, meddra_id, frequency) rows and (meddra_id, pt_name) pairs.
+
+        Rows must be grouped by drug_id; within a drug they keep their order.
+        """
+        meddra_ids = []
+        pt_names = []
+        for meddra_id, pt_name in side_effects:
+            meddra_ids.append(meddra_id)
+            pt_names.append(pt_name)
+        meddra_index = {m: j for j, m in enumerate(meddra_ids)}
+
+        # Typed arrays while streaming: 4 bytes per value instead of a Python object.
+        drug_ids = []
+        indptr = [0]
+        indices = array('i')
+        frequencies = array('f')
+        for drug_id, meddra_id, frequency in rows:
+            j = meddra_index.get(meddra_id)
+            if j is None:
+                continue
+            if not drug_ids or drug_ids[-1] != drug_id:
+                if drug_ids:
+                    indptr.append(len(indices))
+                drug_ids.append(drug_id)
+            indices.append(j)
+            frequencies.append(np.nan if frequency is None else float(frequency))
+        if drug_ids:
+            indptr.append(len(indices))
+        return cls(drug_ids, indptr, np.frombuffer(indices, dtype=np.int32),
+                   np.frombuffer(frequencies, dtype=np.float32), meddra_ids, pt_names)
+
+    @classmethod
+    def load(cls, conn):
+        """Stream drug_side_effects and side_effects from the database into a matrix."""
+        with conn.cursor() as cur:
+            cur.execute('SELECT meddra_id, pt_name FROM side_effects ORDER BY meddra_id')
+            side_effects = cur.fetchall()
+
+        def stream():
+            # Server-side cursor, so the result set is never held as Python tuples all at once.
+            with conn.cursor(name='side_effect_matrix') as cur:
+                cur.itersize = _FETCH_SIZE
+                cur.execute('''
+                    SELECT drug_id, side_effect_id, average_frequency
+                    FROM drug_side_effects
+                    ORDER BY drug_id, average_frequency DESC NULLS LAST
+                ''')
+                yield from cur
+
+        return cls.from_rows(stream(), side_effects)
+
+    @property
+    def shape(self):
+        return len(self.drug_ids), len(self.meddra_ids)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.drug_ids, self.indptr, self.indices, self.frequencies, self.meddra_ids))
+
+    def drug_index(self, drug_id):
+        return self._drug_index.get(drug_id)
+
+    def meddra_index(self, meddra_id):
+        return self._meddra_index.get(meddra_id)
+
+    def row(self, drug_id):
+        """Return (side effect indices, frequencies) views for a drug; empty if unknown."""
+        i = self._drug_index.get(drug_id)
+        if i is None:
+            return self.indices[:0], self.frequencies[:0]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.frequencies[start:end]
+
+    def side_effects_for(self, drug_id):
+        """Return [{'pt_name', 'average_frequency'}] for a drug, highest frequency first."""
+        indices, frequencies = self.row(drug_id)
+        return [
+            # Rounded so float32 noise (0.60000002) does not leak into the UI.
+            {'pt_name': self.pt_names[j], 'average_frequency': None if np.isnan(f) else round(f, 6)}
+            for j, f in zip(indices.tolist(), frequencies.tolist())
+        ]
+
+    def combined_risk(self, drug_ids, min_probability=0.0, limit=None):
+        """Union of the side effects of several drugs with their combined probability.
+
+        Treating drugs as independent, an effect occurs with probability
+        1 - prod(1 - p) over the drugs that list it. Returns
+        (meddra_indices, probabilities, contributors) ordered by probability
+        descending, at most `limit` long; contributors[k] is a list of
+        (drug_id, frequency) pairs, highest frequency first. Unknown drugs and
+        unknown frequencies are ignored.
+        """
+        rows = [(drug_id, self.row(drug_id)) for drug_id in dict.fromkeys(drug_ids)]
+        rows = [(drug_id, idx, freq) for drug_id, (idx, freq) in rows if len(idx)]
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64), []
+
+        indices = np.concatenate([idx for _, idx, _ in rows])
+        frequencies = np.concatenate([freq for _, _, freq in rows]).astype(np.float64)
+        owners = np.repeat(np.array([drug_id for drug_id, _, _ in rows]), [len(idx) for _, idx, _ in rows])
+        known = ~np.isnan(frequencies)
+        indices, frequencies, owners = indices[known], np.clip(frequencies[known], 0.0, 1.0), owners[known]
+
+        # Sum of log(1 - p) per side effect, then back to 1 - prod(1 - p).
+        with np.errstate(divide='ignore'):
+            log_miss = np.log1p(-frequencies)
+        totals = np.bincount(indices, weights=log_miss, minlength=len(self.meddra_ids))
+        present = np.bincount(indices, minlength=len(self.meddra_ids)) > 0
+        effect_indices = np.flatnonzero(present)
+        probabilities = -np.expm1(totals[effect_indices])
+        keep = probabilities >= min_probability
+        effect_indices, probabilities = effect_indices[keep], probabilities[keep]
+        order = np.lexsort((effect_indices, -probabilities))[:limit]
+        effect_indices, probabilities = effect_indices[order], probabilities[order]
+
+        # Group entries by side effect (then frequency) to list contributing drugs.
+        by_effect = np.lexsort((-frequencies, indices))
+        sorted_indices = indices[by_effect]
+        starts = np.searchsorted(sorted_indices, effect_indices, side='left').tolist()
+        ends = np.searchsorted(sorted_indices, effect_indices, side='right').tolist()
+        sorted_owners = owners[by_effect].tolist()
+        sorted_frequencies = np.round(frequencies[by_effect], 6).tolist()
+        contributors = [
+            list(zip(sorted_owners[start:end], sorted_frequencies[start:end]))
+            for start, end in zip(starts, ends)
+        ]
+        return effect_indices.astype(np.int32), probabilities, contributors
+
+_matrix = None
+_matrix_lock = threading.Lock()
+_failed_at = None
+
+
+def get_side_effect_matrix():
+    """Return the process-wide SideEffectMatrix, loading it on first use.
+
+    Returns None if loading fails, and keeps returning None without another
+    attempt for RETRY_AFTER seconds.
+    """
+    global _matrix, _failed_at
+    if _matrix is not None:
+        return _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            if _failed_at is not None and time.monotonic() - _failed_at < RETRY_AFTER:
+                return None
+            with get_connection() as conn:
+                try:
+                    _matrix = SideEffectMatrix.load(conn)
+                    _failed_at = None
+                except Exception as e:
+                    conn.rollback()
+                    _failed_at = time.monotonic()
+                    print(f'get_side_effect_matrix error (retrying in {RETRY_AFTER:.0f}s):', e)
+    return _matrix
+
+
+def invalidate_side_effect_matrix():
+    """Drop the loaded matrix; the next get_side_effect_matrix() reloads it."""
+    global _matrix, _failed_at
+    with _matrix_lock:
+        _matrix = None
+        _failed_at = None
@@ -1,4 +1,5 @@
 from db.database import get_connection
+from data.notifications import notify
 
 
 def _build_note_dict(row):
@@ -45,49 +46,77 @@ def insert_doctor_note(report_id, clinician_id, patient_id, doctor_note):
     Returns:
         request_id of the newly inserted note, or None if failed
     """
-    conn = get_connection()
-    request_id = None
+    with get_connection() as conn:
+        request_id = None
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                INSERT INTO side_effect_requests 
-                (report_id, clinician_id, patient_id, doctor_note)
-                VALUES (%s, %s, %s, %s)
-                RETURNING request_id
-            ''', (report_id, clinician_id, patient_id, doctor_note))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    INSERT INTO side_effect_requests 
+                    (report_id, clinician_id, patient_id, doctor_note)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING request_id
+                ''', (report_id, clinician_id, patient_id, doctor_note))
             
-            result = cur.fetchone()
-            if result:
-                request_id = result[0]
+                result = cur.fetchone()
+                if result:
+                    request_id = result[0]
+                    notify(cur, 'unread_notes', patient_id)
             
-            conn.commit()
-    except Exception as e:
-        print(f"Error inserting doctor note: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+                conn.commit()
+        except Exception as e:
+            print(f"Error inserting doctor note: {e}")
+            conn.rollback()
     
     return request_id
 
 
 def get_doctor_notes_for_report(report_id):
 	"""Get all doctor notes for a specific side effect report."""
-	conn = get_connection()
-	notes = []
+	with get_connection() as conn:
+		notes = []
 	
-	try:
-		with conn.cursor() as cur:
-			cur.execute(_NOTE_QUERY + 'WHERE ser.report_id = %s ORDER BY ser.sent_at DESC', (report_id,))
-			notes = [_build_note_dict(row) for row in cur.fetchall()]
-	except Exception as e:
-		print(f"Error fetching doctor notes for report: {e}")
-	finally:
-		conn.close()
+		try:
+			with conn.cursor() as cur:
+				cur.execute(_NOTE_QUERY + 'WHERE ser.report_id = %s ORDER BY ser.sent_at DESC', (report_id,))
+				notes = [_build_note_dict(row) for row in cur.fetchall()]
+		except Exception as e:
+			print(f"Error fetching doctor notes for report: {e}")
 	
 	return notes
 
 
+def get_doctor_notes_for_reports(report_ids):
+	"""Get doctor notes for many side effect reports in one query.
+
+	Returns {report_id: [note, ...]} (newest first) with an entry, possibly
+	empty, for every requested report.
+	"""
+	report_ids = list(dict.fromkeys(r for r in report_ids if r is not None))
+	notes_by_report = {report_id: [] for report_id in report_ids}
+	if not report_ids:
+		return notes_by_report
+	with get_connection() as conn:
+		try:
+			with conn.cursor() as cur:
+				cur.execute(_NOTE_QUERY + 'WHERE ser.report_id = ANY(%s) ORDER BY ser.sent_at DESC', (report_ids,))
+				for row in cur.fetchall():
+					note = _build_note_dict(row)
+					notes_by_report[note['report_id']].append(note)
+		except Exception as e:
+			print(f"Error fetching doctor notes for reports: {e}")
+	
+	return notes_by_report
+
+
+def attach_doctor_notes(reports):
+	"""Set report['doctor_notes'] on each report dict using one query; returns the reports."""
+	notes_by_report = get_doctor_notes_for_reports(report['report_id'] for report in reports)
+	for report in reports:
+		report['doctor_notes'] = notes_by_report.get(report['report_id'], [])
+	return reports
+
+
 def get_unread_doctor_notes_for_patient(patient_id):
     """
     Get count of unread doctor notes for a patient.
@@ -98,24 +127,22 @@ def get_unread_doctor_notes_for_patient(patient_id):
     Returns:
         Integer count of unread notes
     """
-    conn = get_connection()
-    count = 0
+    with get_connection() as conn:
+        count = 0
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                SELECT COUNT(*) 
-                FROM side_effect_requests 
-                WHERE patient_id = %s AND received = FALSE
-            ''', (patient_id,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    SELECT COUNT(*) 
+                    FROM side_effect_requests 
+                    WHERE patient_id = %s AND received = FALSE
+                ''', (patient_id,))
             
-            result = cur.fetchone()
-            if result:
-                count = result[0]
-    except Exception as e:
-        print(f"Error fetching unread doctor notes count: {e}")
-    finally:
-        conn.close()
+                result = cur.fetchone()
+                if result:
+                    count = result[0]
+        except Exception as e:
+            print(f"Error fetching unread doctor notes count: {e}")
     
     return count
 
@@ -130,50 +157,48 @@ def mark_all_notes_as_received(patient_id):
     Returns:
         Number of notes marked as received
     """
-    conn = get_connection()
-    count = 0
+    with get_connection() as conn:
+        count = 0
     
-    try:
-        with conn.cursor() as cur:
-            cur.execute('''
-                UPDATE side_effect_requests 
-                SET received = TRUE 
-                WHERE patient_id = %s AND received = FALSE
-                RETURNING request_id
-            ''', (patient_id,))
+        try:
+            with conn.cursor() as cur:
+                cur.execute('''
+                    UPDATE side_effect_requests 
+                    SET received = TRUE 
+                    WHERE patient_id = %s AND received = FALSE
+                    RETURNING request_id
+                ''', (patient_id,))
             
-            results = cur.fetchall()
-            count = len(results)
-            conn.commit()
-    except Exception as e:
-        print(f"Error marking notes as received: {e}")
-        conn.rollback()
-    finally:
-        conn.close()
+                results = cur.fetchall()
+                count = len(results)
+                if count:
+                    notify(cur, 'unread_notes', patient_id, -count)
+                conn.commit()
+        except Exception as e:
+            print(f"Error marking notes as received: {e}")
+            conn.rollback()
     
     return count
 
 
 def get_all_notes_for_patient_reports(patient_id):
 	"""Get all doctor notes for all of a patient's side effect reports."""
-	conn = get_connection()
-	notes_by_report = {}
+	with get_connection() as conn:
+		notes_by_report = {}
 	
-	try:
-		with conn.cursor() as cur:
-			cur.execute(_NOTE_QUERY + 'WHERE ser.patient_id = %s ORDER BY ser.sent_at DESC', (patient_id,))
+		try:
+			with conn.cursor() as cur:
+				cur.execute(_NOTE_QUERY + 'WHERE ser.patient_id = %s ORDER BY ser.sent_at DESC', (patient_id,))
 			
-			for row in cur.fetchall():
-				note = _build_note_dict(row)
-				report_id = note['report_id']
+				for row in cur.fetchall():
+					note = _build_note_dict(row)
+					report_id = note['report_id']
 				
-				if report_id not in notes_by_report:
-					notes_by_report[report_id] = []
-				notes_by_report[report_id].append(note)
+					if report_id not in notes_by_report:
+						notes_by_report[report_id] = []
+					notes_by_report[report_id].append(note)
 				
-	except Exception as e:
-		print(f"Error fetching all patient notes: {e}")
-	finally:
-		conn.close()
+		except Exception as e:
+			print(f"Error fetching all patient notes: {e}")
 	
 	return notes_by_report
@@ -1,14 +1,145 @@
 import psycopg2
 import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
+from psycopg2 import extensions
+
+from db.instrumentation import InstrumentedCursor
+from db.pool import ConnectionPool
 
 load_dotenv()
 
-def get_connection():
+_pool = None
+_pool_lock = threading.Lock()
+
+# Connection shared by everything that runs inside `db_session()`. A ContextVar
+# (rather than st.session_state) scopes it to the current script run/thread.
+_session = ContextVar('db_session', default=None)
+
+
+def connect():
+    """Open a new, unpooled connection (for long-lived listeners and batch jobs)."""
     return psycopg2.connect(
         host=os.getenv("DB_HOST", "localhost"),
         port=os.getenv("DB_PORT", "5432"),
         database=os.getenv("DB_NAME", "medipal"),
         user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD")
+        password=os.getenv("DB_PASSWORD"),
+        cursor_factory=InstrumentedCursor
     )
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect,
+                    minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                    acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    idle_timeout=float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300")),
+                    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30")),
+                )
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection for the duration of a `with` block.
+
+    Inside `db_session()` the run's shared connection is used and stays checked
+    out. Otherwise the connection goes back to the pool on exit. Either way, any
+    transaction that was not committed is rolled back when the outermost borrow
+    ends, and a failed one is rolled back as soon as its borrow ends.
+    """
+    session = _session.get()
+    if session is not None:
+        with session.borrow() as conn:
+            yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+class _RunSession:
+    """Lazily borrowed connection shared by one Streamlit script run."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = None
+        self._depth = 0
+
+    def connection(self):
+        if self._conn is None:
+            self._conn = self._pool.acquire()
+        return self._conn
+
+    @contextmanager
+    def borrow(self):
+        """Lend the shared connection to one `get_connection()` block.
+
+        Data functions catch their own errors without always rolling back, so a
+        failed statement must not leave the rest of the run on an aborted
+        transaction; and once the outermost borrow ends nothing uncommitted is
+        kept open (no idle-in-transaction connection while the page renders).
+        """
+        conn = self.connection()
+        self._depth += 1
+        try:
+            yield conn
+        finally:
+            self._depth -= 1
+            try:
+                if not conn.closed:
+                    status = conn.get_transaction_status()
+                    if status == extensions.TRANSACTION_STATUS_INERROR or (
+                        self._depth == 0 and status != extensions.TRANSACTION_STATUS_IDLE
+                    ):
+                        conn.rollback()
+            except Exception:
+                pass
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if not conn.closed:
+                conn.rollback()
+        except Exception:
+            pass
+        self._pool.release(conn)
+
+
+@contextmanager
+def db_session():
+    """Share one pooled connection across a whole Streamlit script run.
+
+    Every `get_connection()` made inside the block (pages, components, data
+    functions) reuses it instead of going through the pool each time. The
+    connection stays at the server default isolation (READ COMMITTED) and each
+    borrow ends its own transaction, so writes made after page reads do not
+    hit serialization failures. The connection is only borrowed once something
+    queries. Nested calls reuse the outer session.
+    """
+    if _session.get() is not None:
+        yield
+        return
+
+    session = _RunSession(get_pool())
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+        session.close()
@@ -0,0 +1,261 @@
+"""Query instrumentation: per-rerun query statistics, a slow-query log and
+an N+1 query detector.
+
+Every connection opened by db.database uses `InstrumentedCursor`, so all
+queries issued from data/ and auth/ are timed without changes at the call
+sites. Wrap a script run in `track_queries()` to aggregate them, and a call
+tree in `query_scope()` to check it for N+1 patterns on its own.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from collections import Counter
+from contextvars import ContextVar
+
+from psycopg2 import extensions
+
+logger = logging.getLogger('medipal.db')
+slow_query_logger = logging.getLogger('medipal.db.slow')
+
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+
+# Same fingerprint executed more than this many times in one scope is an N+1.
+N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', '5'))
+# 'warn' (production default), 'raise' (tests / local runs) or 'off'.
+N_PLUS_ONE_MODE = os.getenv('DB_N_PLUS_ONE_MODE', 'warn').lower()
+
+# Process-wide count of N+1 detections per fingerprint, for dashboards/logs.
+n_plus_one_warnings = Counter()
+
+_slow_log_path = os.getenv('DB_SLOW_QUERY_LOG')
+if _slow_log_path and not slow_query_logger.handlers:
+    _handler = logging.FileHandler(_slow_log_path)
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.setLevel(logging.INFO)
+
+# Active scopes, outermost (the whole run) first.
+_scopes = ContextVar('db_query_scopes', default=())
+
+_DB_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Normalize SQL so that the same statement with different values compares equal."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = str(sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _VALUE_LIST.sub('(?)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _param_count(params):
+    if params is None:
+        return 0
+    if isinstance(params, (list, tuple, dict)):
+        return len(params)
+    return 1
+
+
+def _calling_function():
+    """Return 'module.function' of the first frame outside db/ and the stdlib."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (os.path.dirname(filename) != _DB_PACKAGE_DIR
+                and 'contextlib' not in filename
+                and 'psycopg2' not in filename):
+            module = frame.f_globals.get('__name__', '?')
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class QueryRecord:
+    """One executed statement."""
+
+    __slots__ = ('fingerprint', 'param_count', 'rows', 'duration_ms', 'caller')
+
+    def __init__(self, fingerprint, param_count, rows, duration_ms, caller):
+        self.fingerprint = fingerprint
+        self.param_count = param_count
+        self.rows = rows
+        self.duration_ms = duration_ms
+        self.caller = caller
+
+    def __repr__(self):
+        return (f"QueryRecord({self.duration_ms:.1f}ms rows={self.rows} "
+                f"params={self.param_count} caller={self.caller!r} sql={self.fingerprint!r})")
+
+
+class NPlusOneQueryError(AssertionError):
+    """Raised in 'raise' mode when a scope repeats the same query too often."""
+
+    def __init__(self, report, offenders):
+        super().__init__(report)
+        self.report = report
+        self.offenders = offenders
+
+
+class QueryStats:
+    """Queries recorded during one scope (a script run or a call tree), aggregated by fingerprint."""
+
+    def __init__(self, name='rerun', n_plus_one_threshold=None):
+        self.name = name
+        self.n_plus_one_threshold = (
+            N_PLUS_ONE_THRESHOLD if n_plus_one_threshold is None else n_plus_one_threshold
+        )
+        self.records = []
+        self.flagged = set()
+
+    def add(self, record):
+        self.records.append(record)
+
+    @property
+    def count(self):
+        return len(self.records)
+
+    @property
+    def total_ms(self):
+        return sum(r.duration_ms for r in self.records)
+
+    def by_fingerprint(self):
+        """Return {fingerprint: {'count', 'total_ms', 'max_ms', 'rows', 'callers'}}, most frequent first."""
+        summary = {}
+        for r in self.records:
+            entry = summary.setdefault(r.fingerprint, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'callers': set()
+            })
+            entry['count'] += 1
+            entry['total_ms'] += r.duration_ms
+            entry['max_ms'] = max(entry['max_ms'], r.duration_ms)
+            entry['rows'] += max(r.rows, 0)
+            entry['callers'].add(r.caller)
+        return dict(sorted(summary.items(), key=lambda kv: (-kv[1]['count'], -kv[1]['total_ms'])))
+
+    def summary(self):
+        """One-line human readable summary."""
+        return f"{self.count} queries, {self.total_ms:.1f} ms, {len(self.by_fingerprint())} distinct"
+
+    def n_plus_one_offenders(self):
+        """Return {fingerprint: aggregate} for statements repeated above the threshold."""
+        return {
+            sql: entry for sql, entry in self.by_fingerprint().items()
+            if entry['count'] > self.n_plus_one_threshold and sql not in self.flagged
+        }
+
+    def n_plus_one_report(self, offenders):
+        lines = [f"N+1 queries detected in {self.name} (threshold {self.n_plus_one_threshold}):"]
+        for sql, entry in offenders.items():
+            callers = ', '.join(sorted(entry['callers']))
+            lines.append(f"  {entry['count']}x {entry['total_ms']:.1f} ms [{callers}] {sql}")
+        return '\n'.join(lines)
+
+
+def current_stats():
+    """Return the QueryStats of the run in progress, or None outside `track_queries()`."""
+    scopes = _scopes.get()
+    return scopes[0] if scopes else None
+
+
+def _check_n_plus_one(stats, enclosing):
+    if N_PLUS_ONE_MODE == 'off':
+        return
+    offenders = stats.n_plus_one_offenders()
+    if not offenders:
+        return
+    # Report each offender once, in the innermost scope that caught it.
+    for scope in enclosing:
+        scope.flagged.update(offenders)
+    report = stats.n_plus_one_report(offenders)
+    n_plus_one_warnings.update(offenders.keys())
+    if N_PLUS_ONE_MODE == 'raise':
+        raise NPlusOneQueryError(report, offenders)
+    logger.warning(report)
+
+
+@contextmanager
+def _push_scope(stats):
+    scopes = _scopes.get()
+    token = _scopes.set(scopes + (stats,))
+    failed = False
+    try:
+        yield stats
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _scopes.reset(token)
+        if not failed:
+            _check_n_plus_one(stats, scopes)
+
+
+@contextmanager
+def track_queries():
+    """Collect every query executed inside the block into a QueryStats.
+
+    On exit the run is checked for N+1 patterns. Nested calls share the
+    outer collection.
+    """
+    stats = current_stats()
+    if stats is not None:
+        yield stats
+        return
+
+    with _push_scope(QueryStats()) as stats:
+        yield stats
+    logger.debug('query stats: %s', stats.summary())
+
+
+@contextmanager
+def query_scope(name, n_plus_one_threshold=None):
+    """Check one call tree for N+1 queries; usable as `with` or as a decorator.
+
+    Queries inside still count towards the enclosing run.
+    """
+    with _push_scope(QueryStats(name, n_plus_one_threshold)) as stats:
+        yield stats
+
+
+def record_query(sql, params, rows, duration_ms):
+    """Record one executed statement and log it if it was slow."""
+    record = QueryRecord(fingerprint(sql), _param_count(params), rows, duration_ms, _calling_function())
+    for stats in _scopes.get():
+        stats.add(record)
+    if duration_ms >= SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            'slow query %.1f ms rows=%s params=%d caller=%s sql=%s',
+            duration_ms, rows, record.param_count, record.caller, record.fingerprint
+        )
+    return record
+
+
+class InstrumentedCursor(extensions.cursor):
+    """psycopg2 cursor that times every execute() and reports it to `record_query`."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, vars, self.rowcount, (time.perf_counter() - start) * 1000)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record_query(query, vars_list, self.rowcount, (time.perf_counter() - start) * 1000)
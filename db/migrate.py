@@ -0,0 +1,80 @@
+"""Apply the SQL migrations in db/migrations in filename order.
+
+Usage: python -m db.migrate [--list]
+
+Applied versions are recorded in the `schema_migrations` table, so running it
+again only applies new files. Each file runs in its own transaction.
+"""
+import argparse
+import os
+import sys
+
+from db.database import connect
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def _migration_files():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql'))
+
+
+def _applied_versions(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    ''')
+    cur.execute('SELECT version FROM schema_migrations')
+    return {row[0] for row in cur.fetchall()}
+
+
+def pending_migrations(conn):
+    """Return the migration filenames not yet applied to this database."""
+    with conn.cursor() as cur:
+        applied = _applied_versions(cur)
+    conn.commit()
+    return [f for f in _migration_files() if f not in applied]
+
+
+def apply_migrations(conn):
+    """Apply every pending migration and return the list of applied filenames."""
+    applied = []
+    for filename in pending_migrations(conn):
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+            sql = f.read()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute('INSERT INTO schema_migrations (version) VALUES (%s)', (filename,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(filename)
+    return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply MediPal database migrations.')
+    parser.add_argument('--list', action='store_true', help='only list pending migrations')
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        if args.list:
+            for filename in pending_migrations(conn):
+                print(filename)
+            return 0
+        for filename in apply_migrations(conn):
+            print(f'applied {filename}')
+        return 0
+    except Exception as e:
+        print(f'migration failed: {e}', file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
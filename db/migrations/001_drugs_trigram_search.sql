@@ -0,0 +1,13 @@
+-- Trigram index for ranked, typo-tolerant drug name search (get_drugs_by_search).
+-- Needs the pg_trgm contrib extension. If it is not installed on the server,
+-- or this role may not create it, the migration only logs a NOTICE so the
+-- later migrations still apply; search then falls back to substring LIKE.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS drugs_display_name_trgm_idx
+        ON drugs USING gin (lower(display_name) gin_trgm_ops);
+EXCEPTION WHEN others THEN
+    RAISE NOTICE 'pg_trgm unavailable (%), skipping drugs_display_name_trgm_idx', SQLERRM;
+END
+$$;
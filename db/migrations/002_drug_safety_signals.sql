@@ -0,0 +1,23 @@
+-- Disproportionality statistics per drug x MedDRA PT, written by
+-- `python -m jobs.signal_detection` and read by the clinician view.
+CREATE TABLE IF NOT EXISTS drug_safety_signals (
+    drug_id INTEGER NOT NULL,
+    side_effect_id INTEGER NOT NULL,
+    report_count INTEGER NOT NULL,
+    drug_report_count INTEGER NOT NULL,
+    pt_report_count INTEGER NOT NULL,
+    total_reports INTEGER NOT NULL,
+    prr DOUBLE PRECISION,
+    prr_lower DOUBLE PRECISION,
+    prr_upper DOUBLE PRECISION,
+    ror DOUBLE PRECISION,
+    ror_lower DOUBLE PRECISION,
+    ror_upper DOUBLE PRECISION,
+    chi_square DOUBLE PRECISION,
+    is_signal BOOLEAN NOT NULL DEFAULT FALSE,
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (drug_id, side_effect_id)
+);
+
+CREATE INDEX IF NOT EXISTS drug_safety_signals_signal_idx
+    ON drug_safety_signals (drug_id, prr DESC) WHERE is_signal;
@@ -0,0 +1,4 @@
+-- Keyset pagination of a patient's reports, newest first with undated ones
+-- last (see get_patient_side_effect_reports_page).
+CREATE INDEX IF NOT EXISTS patient_side_effects_user_reported_idx
+    ON patient_side_effects (user_id, reported_at DESC NULLS LAST, report_id DESC);
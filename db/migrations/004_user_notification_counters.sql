@@ -0,0 +1,99 @@
+-- Per-user badge counters kept in step with their source tables by
+-- triggers, so a badge is one primary-key read (see data/notifications.py).
+CREATE TABLE IF NOT EXISTS user_notification_counters (
+    user_id INTEGER PRIMARY KEY,
+    medication_requests INTEGER NOT NULL DEFAULT 0,
+    unread_notes INTEGER NOT NULL DEFAULT 0,
+    side_effect_reports INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_notification_counter(p_user_id INTEGER, p_counter TEXT, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    IF p_user_id IS NULL OR p_delta = 0 THEN
+        RETURN;
+    END IF;
+    EXECUTE format(
+        'INSERT INTO user_notification_counters AS c (user_id, %1$I) VALUES ($1, GREATEST($2, 0))
+         ON CONFLICT (user_id) DO UPDATE
+         SET %1$I = GREATEST(c.%1$I + $2, 0), updated_at = NOW()',
+        p_counter
+    ) USING p_user_id, p_delta;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Pending (not yet responded) medication requests per patient.
+CREATE OR REPLACE FUNCTION medication_requests_count_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND NOT COALESCE(OLD.responded, FALSE) THEN
+        PERFORM bump_notification_counter(OLD.patient_id, 'medication_requests', -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NOT COALESCE(NEW.responded, FALSE) THEN
+        PERFORM bump_notification_counter(NEW.patient_id, 'medication_requests', 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS medication_requests_count ON medication_requests;
+CREATE TRIGGER medication_requests_count
+    AFTER INSERT OR UPDATE OF responded, patient_id OR DELETE ON medication_requests
+    FOR EACH ROW EXECUTE FUNCTION medication_requests_count_trigger();
+
+-- Doctor notes the patient has not seen yet.
+CREATE OR REPLACE FUNCTION side_effect_requests_count_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND NOT COALESCE(OLD.received, FALSE) THEN
+        PERFORM bump_notification_counter(OLD.patient_id, 'unread_notes', -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NOT COALESCE(NEW.received, FALSE) THEN
+        PERFORM bump_notification_counter(NEW.patient_id, 'unread_notes', 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS side_effect_requests_count ON side_effect_requests;
+CREATE TRIGGER side_effect_requests_count
+    AFTER INSERT OR UPDATE OF received, patient_id OR DELETE ON side_effect_requests
+    FOR EACH ROW EXECUTE FUNCTION side_effect_requests_count_trigger();
+
+-- Side effect reports filed by each patient.
+CREATE OR REPLACE FUNCTION patient_side_effects_count_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_notification_counter(OLD.user_id, 'side_effect_reports', -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_notification_counter(NEW.user_id, 'side_effect_reports', 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS patient_side_effects_count ON patient_side_effects;
+CREATE TRIGGER patient_side_effects_count
+    AFTER INSERT OR UPDATE OF user_id OR DELETE ON patient_side_effects
+    FOR EACH ROW EXECUTE FUNCTION patient_side_effects_count_trigger();
+
+-- Backfill from the existing rows.
+INSERT INTO user_notification_counters (user_id, medication_requests, unread_notes, side_effect_reports)
+SELECT user_id, SUM(medication_requests), SUM(unread_notes), SUM(side_effect_reports)
+FROM (
+    SELECT patient_id AS user_id, COUNT(*) AS medication_requests, 0 AS unread_notes, 0 AS side_effect_reports
+    FROM medication_requests WHERE NOT COALESCE(responded, FALSE) GROUP BY patient_id
+    UNION ALL
+    SELECT patient_id, 0, COUNT(*), 0
+    FROM side_effect_requests WHERE NOT COALESCE(received, FALSE) GROUP BY patient_id
+    UNION ALL
+    SELECT user_id, 0, 0, COUNT(*)
+    FROM patient_side_effects GROUP BY user_id
+) counts
+WHERE user_id IS NOT NULL
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE
+SET medication_requests = EXCLUDED.medication_requests,
+    unread_notes = EXCLUDED.unread_notes,
+    side_effect_reports = EXCLUDED.side_effect_reports,
+    updated_at = NOW();
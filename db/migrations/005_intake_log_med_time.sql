@@ -0,0 +1,4 @@
+-- Range reads of one medication's intake history (get_intake_log_for_med,
+-- get_intake_status_for_day).
+CREATE INDEX IF NOT EXISTS medication_intake_log_med_time_idx
+    ON medication_intake_log (patient_med_id, taken_time DESC);
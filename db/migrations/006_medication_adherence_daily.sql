@@ -0,0 +1,82 @@
+-- Taken/missed intake counts per medication per day, kept in step with
+-- medication_intake_log by statement-level triggers, so adherence is a SUM
+-- over days instead of a scan of every intake event (data/adherence_stats.py).
+-- A log with taken NULL counts as missed, as before.
+CREATE TABLE IF NOT EXISTS medication_adherence_daily (
+    patient_med_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    taken_count INTEGER NOT NULL DEFAULT 0,
+    missed_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (patient_med_id, day)
+);
+
+CREATE OR REPLACE FUNCTION medication_adherence_daily_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO medication_adherence_daily AS d (patient_med_id, day, taken_count, missed_count)
+        SELECT patient_med_id, taken_time::date,
+               COUNT(*) FILTER (WHERE taken), COUNT(*) FILTER (WHERE taken IS NOT TRUE)
+        FROM new_rows
+        GROUP BY 1, 2
+        ON CONFLICT (patient_med_id, day) DO UPDATE
+        SET taken_count = d.taken_count + EXCLUDED.taken_count,
+            missed_count = d.missed_count + EXCLUDED.missed_count;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE medication_adherence_daily d
+        SET taken_count = d.taken_count - o.taken_count,
+            missed_count = d.missed_count - o.missed_count
+        FROM (
+            SELECT patient_med_id, taken_time::date AS day,
+                   COUNT(*) FILTER (WHERE taken) AS taken_count,
+                   COUNT(*) FILTER (WHERE taken IS NOT TRUE) AS missed_count
+            FROM old_rows
+            GROUP BY 1, 2
+        ) o
+        WHERE d.patient_med_id = o.patient_med_id AND d.day = o.day;
+    ELSE
+        INSERT INTO medication_adherence_daily AS d (patient_med_id, day, taken_count, missed_count)
+        SELECT patient_med_id, day, SUM(taken_delta), SUM(missed_delta)
+        FROM (
+            SELECT patient_med_id, taken_time::date AS day,
+                   (taken IS TRUE)::int AS taken_delta, (taken IS NOT TRUE)::int AS missed_delta
+            FROM new_rows
+            UNION ALL
+            SELECT patient_med_id, taken_time::date,
+                   -(taken IS TRUE)::int, -(taken IS NOT TRUE)::int
+            FROM old_rows
+        ) changes
+        GROUP BY 1, 2
+        ON CONFLICT (patient_med_id, day) DO UPDATE
+        SET taken_count = d.taken_count + EXCLUDED.taken_count,
+            missed_count = d.missed_count + EXCLUDED.missed_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS medication_adherence_daily_insert ON medication_intake_log;
+CREATE TRIGGER medication_adherence_daily_insert
+    AFTER INSERT ON medication_intake_log
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION medication_adherence_daily_trigger();
+
+DROP TRIGGER IF EXISTS medication_adherence_daily_update ON medication_intake_log;
+CREATE TRIGGER medication_adherence_daily_update
+    AFTER UPDATE ON medication_intake_log
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION medication_adherence_daily_trigger();
+
+DROP TRIGGER IF EXISTS medication_adherence_daily_delete ON medication_intake_log;
+CREATE TRIGGER medication_adherence_daily_delete
+    AFTER DELETE ON medication_intake_log
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION medication_adherence_daily_trigger();
+
+-- Backfill from the existing log.
+INSERT INTO medication_adherence_daily (patient_med_id, day, taken_count, missed_count)
+SELECT patient_med_id, taken_time::date,
+       COUNT(*) FILTER (WHERE taken), COUNT(*) FILTER (WHERE taken IS NOT TRUE)
+FROM medication_intake_log
+GROUP BY 1, 2
+ON CONFLICT (patient_med_id, day) DO UPDATE
+SET taken_count = EXCLUDED.taken_count, missed_count = EXCLUDED.missed_count;
@@ -0,0 +1,153 @@
+"""Bounded, thread-safe PostgreSQL connection pool shared by the whole process."""
+import threading
+import time
+
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be borrowed within the acquire timeout."""
+
+
+class ConnectionPool:
+    """Keep between `minconn` and `maxconn` open connections and hand them out.
+
+    Connections idle for longer than `idle_timeout` seconds are closed (down to
+    `minconn`) whenever the pool is touched. A connection that sat idle for more
+    than `ping_after` seconds is checked with `SELECT 1` before it is handed out,
+    so a backend killed by Postgres or a network blip never reaches the caller.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, acquire_timeout=10.0,
+                 idle_timeout=300.0, ping_after=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # list of (conn, released_at), most recently used last
+        self._size = 0
+        self._closed = False
+
+    @property
+    def size(self):
+        """Number of open connections (idle and borrowed)."""
+        return self._size
+
+    @property
+    def idle_count(self):
+        """Number of connections currently waiting in the pool."""
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        """Borrow a healthy connection, opening a new one if below `maxconn`."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn, released_at = None, None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                self._reap_locked()
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"no database connection available after {timeout:.1f}s "
+                            f"(pool size {self.maxconn})"
+                        )
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise PoolTimeout("connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._discard(None)
+                    raise
+
+            if self._is_healthy(conn, released_at):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        """Return a borrowed connection, resetting any transaction left open."""
+        if conn is None:
+            return
+        if conn.closed or self._closed:
+            self._discard(conn)
+            return
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._reap_locked()
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection and refuse further borrowing."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def _is_healthy(self, conn, released_at):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - released_at < self.ping_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        if conn is not None:
+            _close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _reap_locked(self):
+        """Close connections idle for longer than `idle_timeout`, keeping `minconn`."""
+        if not self._idle or self._size <= self.minconn:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # Oldest connections sit at the front of the list.
+        while self._idle and self._size > self.minconn and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            _close_quietly(conn)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
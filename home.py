@@ -1,6 +1,9 @@
 import streamlit as st
 from hydralit import HydraApp
 import apps
+from db.database import db_session
+from db.instrumentation import track_queries
+import os
 
 st.set_page_config(page_title='MediPal',page_icon="🐙",layout='wide',initial_sidebar_state='auto')
 
@@ -26,85 +29,94 @@ if __name__ == "__main__":
     app.add_app("Create Account", icon="📝", app=apps.SignUpApp(title="Create Account"))
     app.add_app("Account", icon="🧑‍💼", app=apps.AccountApp(title="Account"))
 
-    # Notification badge logic
-    notification_count = 0
-    logged_in = st.session_state.get('logged_in', False)
-    if logged_in:
-        from data.patient_profile import get_user_role
-        user_id = st.session_state.get('current_id')
-        role = get_user_role(user_id) if user_id else None
+    # One pooled connection for this whole rerun, with every query it makes
+    # recorded
+    with db_session(), track_queries() as query_stats:
+        # Notification badge logic
+        notification_count = 0
+        logged_in = st.session_state.get('logged_in', False)
+        if logged_in:
+            from data.patient_profile import get_user_role
+            user_id = st.session_state.get('current_id')
+            role = get_user_role(user_id) if user_id else None
         
-        if role == 0:  # Patient
-            from data.medication_requests import get_pending_requests_for_patient
-            med_request_count = len(get_pending_requests_for_patient(user_id))
+            # Badge counters are kept in memory by the LISTEN/NOTIFY listener
+            from data.notifications import get_notification_counts
+        
+            if role == 0:  # Patient
+                counts = get_notification_counts(user_id)
+                med_request_count = counts['medication_requests']
             
-            # Check for unread doctor notes
-            from data.side_effect_requests import get_unread_doctor_notes_for_patient
-            unread_notes_count = get_unread_doctor_notes_for_patient(user_id)
+                # Check for unread doctor notes
+                unread_notes_count = counts['unread_notes']
             
-            # Total notification count includes both medication requests and unread notes
-            notification_count = med_request_count + unread_notes_count
+                # Total notification count includes both medication requests and unread notes
+                notification_count = med_request_count + unread_notes_count
             
-            last_seen = st.session_state.get('last_seen_notification_count', 0)
-            if notification_count > last_seen:
-                if med_request_count > 0:
-                    st.toast(f"You have {med_request_count} new medication request(s)!", icon="🔔")
-                if unread_notes_count > 0:
-                    st.toast(f"You have {unread_notes_count} new doctor note(s) on your side effect reports!", icon="💬")
-            st.session_state['last_seen_notification_count'] = notification_count
+                last_seen = st.session_state.get('last_seen_notification_count', 0)
+                if notification_count > last_seen:
+                    if med_request_count > 0:
+                        st.toast(f"You have {med_request_count} new medication request(s)!", icon="🔔")
+                    if unread_notes_count > 0:
+                        st.toast(f"You have {unread_notes_count} new doctor note(s) on your side effect reports!", icon="💬")
+                st.session_state['last_seen_notification_count'] = notification_count
         
-        elif role == 1:  # Clinician
-            # Check for new side effect reports from authorized patient
-            patient_id = st.session_state.get('authorized_patient_id')
-            if patient_id:
-                from data.patient_side_effect import get_side_effect_reports_count
-                side_effect_count = get_side_effect_reports_count(patient_id)
-                last_seen_se = st.session_state.get('last_seen_side_effect_count', 0)
-                if side_effect_count > last_seen_se:
-                    new_count = side_effect_count - last_seen_se
-                    st.toast(f"Patient has {new_count} new side effect report(s)!", icon="⚠️")
-                st.session_state['last_seen_side_effect_count'] = side_effect_count
+            elif role == 1:  # Clinician
+                # Check for new side effect reports from authorized patient
+                patient_id = st.session_state.get('authorized_patient_id')
+                if patient_id:
+                    side_effect_count = get_notification_counts(patient_id)['side_effect_reports']
+                    last_seen_se = st.session_state.get('last_seen_side_effect_count', 0)
+                    if side_effect_count > last_seen_se:
+                        new_count = side_effect_count - last_seen_se
+                        st.toast(f"Patient has {new_count} new side effect report(s)!", icon="⚠️")
+                    st.session_state['last_seen_side_effect_count'] = side_effect_count
     
-    # Add Notifications tab with badge
-    notifications_key = "Notifications"
-    notifications_label = f"Notifications{' [' + str(notification_count) + ']' if notification_count > 0 else ''}"
-    app.add_app(notifications_key, icon="🔔", app=apps.NotificationsApp(title=notifications_label))
+        # Add Notifications tab with badge
+        notifications_key = "Notifications"
+        notifications_label = f"Notifications{' [' + str(notification_count) + ']' if notification_count > 0 else ''}"
+        app.add_app(notifications_key, icon="🔔", app=apps.NotificationsApp(title=notifications_label))
 
-    if logged_in:
-        complex_nav = {
-            'Home': ['Home'],
-            'Medication Tracker': ['Medication Tracker'],
-            'Side Effects': ['Side Effects'],
-            'Medical History Log': ['Medical History Log'],
-            'Emergency Dashboard': ['Emergency Dashboard'],
-            notifications_key: ['Notifications'],
-            'Account': ['Account'],
-        }
-    else:
-        # Show only Home, Login, and Create Account when not logged in
-        complex_nav = {
-            'Home': ['Home'],
-            'Login': ['Login'],
-            'Create Account': ['Create Account'],
-        }
+        if logged_in:
+            complex_nav = {
+                'Home': ['Home'],
+                'Medication Tracker': ['Medication Tracker'],
+                'Side Effects': ['Side Effects'],
+                'Medical History Log': ['Medical History Log'],
+                'Emergency Dashboard': ['Emergency Dashboard'],
+                notifications_key: ['Notifications'],
+                'Account': ['Account'],
+            }
+        else:
+            # Show only Home, Login, and Create Account when not logged in
+            complex_nav = {
+                'Home': ['Home'],
+                'Login': ['Login'],
+                'Create Account': ['Create Account'],
+            }
 
-    # and finally just the entire app and all the children.
-    try:
-        app.run(complex_nav)
-    except KeyError as e:
-        missing = str(e)
-        # Try to list registered app keys for debugging
-        registered = None
+        # and finally just the entire app and all the children.
         try:
-            registered = list(getattr(app, '_navbar_pointers', {}).keys())
-        except Exception:
+            app.run(complex_nav)
+            if os.getenv('DB_SHOW_QUERY_STATS'):
+                with st.sidebar.expander(f"🛢️ DB: {query_stats.summary()}"):
+                    for sql, entry in query_stats.by_fingerprint().items():
+                        st.caption(f"{entry['count']}× {entry['total_ms']:.1f} ms — {', '.join(sorted(entry['callers']))}")
+                        st.code(sql, language='sql')
+        except KeyError as e:
+            missing = str(e)
+            # Try to list registered app keys for debugging
+            registered = None
             try:
-                registered = [a[0] for a in getattr(app, '_apps', [])]
+                registered = list(getattr(app, '_navbar_pointers', {}).keys())
             except Exception:
-                registered = None
+                try:
+                    registered = [a[0] for a in getattr(app, '_apps', [])]
+                except Exception:
+                    registered = None
 
-        st.error(f"Navigation configuration error: missing menu key {missing}.")
-        if registered is not None:
-            st.write("Registered app keys:")
-            st.write(registered)
-        st.stop()
\ No newline at end of file
+            st.error(f"Navigation configuration error: missing menu key {missing}.")
+            if registered is not None:
+                st.write("Registered app keys:")
+                st.write(registered)
+            st.stop()
\ No newline at end of file
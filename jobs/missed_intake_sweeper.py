@@ -0,0 +1,65 @@
+"""Log missed intakes for every patient at the end of a day.
+
+Usage: python -m jobs.missed_intake_sweeper [--date YYYY-MM-DD | --from YYYY-MM-DD --to YYYY-MM-DD]
+
+For each day, one INSERT ... SELECT (data.missed_intakes) adds a missed row
+(taken = FALSE at 23:59:59) for every patient_medications row active that
+day that has no intake log that day, across all users. Medications already
+logged that day are skipped, so re-runs and overlapping backfills add
+nothing. Each day commits on its own. Defaults to yesterday, for a cron
+entry shortly after midnight.
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+
+from data.missed_intakes import insert_missed_intakes_for_day
+from db.database import connect
+
+
+def sweep(conn, start, end):
+    """Sweep every day from start to end inclusive; return {day: rows inserted}."""
+    inserted = {}
+    day = start
+    while day <= end:
+        with conn.cursor() as cur:
+            inserted[day] = insert_missed_intakes_for_day(cur, day)
+        conn.commit()
+        day += timedelta(days=1)
+    return inserted
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Log missed medication intakes for all patients.')
+    parser.add_argument('--date', type=_parse_date, help='day to sweep (default: yesterday)')
+    parser.add_argument('--from', dest='start', type=_parse_date, help='first day of a backfill range')
+    parser.add_argument('--to', dest='end', type=_parse_date, help='last day of a backfill range (default: yesterday)')
+    args = parser.parse_args(argv)
+
+    yesterday = date.today() - timedelta(days=1)
+    if args.start:
+        start, end = args.start, args.end or yesterday
+    else:
+        start = end = args.date or yesterday
+    if start > end:
+        parser.error('--from must not be after --to')
+
+    conn = connect()
+    try:
+        for day, count in sweep(conn, start, end).items():
+            print(f'{day}: logged {count} missed intakes')
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f'missed intake sweep failed: {e}', file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
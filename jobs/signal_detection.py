@@ -0,0 +1,184 @@
+"""Pharmacovigilance signal detection over all patient side effect reports.
+
+Usage: python -m jobs.signal_detection [--chunk-size N] [--min-reports N]
+
+For every drug x MedDRA PT pair reported together, builds the 2x2 table
+
+                     PT        other PTs
+    drug             a         b
+    other drugs      c         d
+
+over distinct reports and computes the proportional reporting ratio (PRR)
+and reporting odds ratio (ROR) with 95% confidence intervals, plus the
+Yates chi-square. A pair is flagged as a signal by the usual criteria:
+a >= 3, PRR >= 2 and chi-square >= 4.
+
+A report counts against its own medication when the patient picked one,
+and otherwise against every medication the patient had active on the day
+it was reported. Pair counts are aggregated in PostgreSQL and streamed
+through a server-side cursor in chunks; each chunk is scored with NumPy and
+written to drug_safety_signals. The table is replaced in one transaction, so
+readers see either the previous run or the new one.
+"""
+import argparse
+import sys
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db.database import connect
+
+Z_95 = 1.959963984540054
+SIGNAL_MIN_REPORTS = 3
+SIGNAL_MIN_PRR = 2.0
+SIGNAL_MIN_CHI_SQUARE = 4.0
+
+# (report_id, drug_id, side_effect_id), one row per suspect drug of a report.
+_REPORT_DRUGS = '''
+    SELECT pse.report_id, pm.drug_id, pse.side_effect_id
+    FROM patient_side_effects pse
+    JOIN patient_medications pm ON pm.patient_med_id = pse.patient_med_id
+    WHERE pse.side_effect_id IS NOT NULL
+    UNION
+    SELECT pse.report_id, pm.drug_id, pse.side_effect_id
+    FROM patient_side_effects pse
+    JOIN patient_medications pm
+        ON pm.user_id = pse.user_id
+        AND pm.start_date <= pse.reported_at::date
+        AND (pm.end_date IS NULL OR pm.end_date >= pse.reported_at::date)
+    WHERE pse.patient_med_id IS NULL AND pse.side_effect_id IS NOT NULL
+'''
+
+
+def disproportionality(a, b, c, d):
+    """Vectorised PRR/ROR statistics for arrays of 2x2 cell counts.
+
+    Returns a dict of float64 arrays: prr, prr_lower, prr_upper, ror,
+    ror_lower, ror_upper and chi_square. Tables with an empty cell get a
+    0.5 (Haldane) correction for the ratios and intervals.
+    """
+    a, b, c, d = (np.asarray(x, dtype=np.float64) for x in (a, b, c, d))
+    n = a + b + c + d
+
+    zero = (a == 0) | (b == 0) | (c == 0) | (d == 0)
+    correction = np.where(zero, 0.5, 0.0)
+    ac, bc, cc, dc = a + correction, b + correction, c + correction, d + correction
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prr = (ac / (ac + bc)) / (cc / (cc + dc))
+        se_ln_prr = np.sqrt(1 / ac - 1 / (ac + bc) + 1 / cc - 1 / (cc + dc))
+        ror = (ac * dc) / (bc * cc)
+        se_ln_ror = np.sqrt(1 / ac + 1 / bc + 1 / cc + 1 / dc)
+
+        yates = np.maximum(np.abs(a * d - b * c) - n / 2, 0.0)
+        chi_square = n * yates ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+
+    return {
+        'prr': prr,
+        'prr_lower': np.exp(np.log(prr) - Z_95 * se_ln_prr),
+        'prr_upper': np.exp(np.log(prr) + Z_95 * se_ln_prr),
+        'ror': ror,
+        'ror_lower': np.exp(np.log(ror) - Z_95 * se_ln_ror),
+        'ror_upper': np.exp(np.log(ror) + Z_95 * se_ln_ror),
+        'chi_square': np.nan_to_num(chi_square, nan=0.0, posinf=0.0),
+    }
+
+
+def _marginals(cur):
+    # Rows of report_drugs are distinct, and a report has one PT, so plain
+    # counts are report counts except for the overall total.
+    cur.execute('SELECT COUNT(DISTINCT report_id) FROM report_drugs')
+    total = cur.fetchone()[0]
+    cur.execute('SELECT drug_id, COUNT(*) FROM report_drugs GROUP BY drug_id')
+    by_drug = dict(cur.fetchall())
+    cur.execute('SELECT side_effect_id, COUNT(DISTINCT report_id) FROM report_drugs GROUP BY side_effect_id')
+    by_pt = dict(cur.fetchall())
+    return total, by_drug, by_pt
+
+
+def _score_chunk(rows, total, by_drug, by_pt):
+    drug_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    pt_ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    a = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+    n_drug = np.fromiter((by_drug[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+    n_pt = np.fromiter((by_pt[r[1]] for r in rows), dtype=np.int64, count=len(rows))
+
+    b = n_drug - a
+    c = n_pt - a
+    d = total - a - b - c
+    stats = disproportionality(a, b, c, d)
+    is_signal = (
+        (a >= SIGNAL_MIN_REPORTS)
+        & (stats['prr'] >= SIGNAL_MIN_PRR)
+        & (stats['chi_square'] >= SIGNAL_MIN_CHI_SQUARE)
+    )
+
+    def column(values):
+        # NaN/inf (degenerate tables) are stored as NULL.
+        return [v if np.isfinite(v) else None for v in values.tolist()]
+
+    columns = [
+        drug_ids.tolist(), pt_ids.tolist(), a.tolist(), n_drug.tolist(), n_pt.tolist(),
+        [total] * len(rows),
+        column(stats['prr']), column(stats['prr_lower']), column(stats['prr_upper']),
+        column(stats['ror']), column(stats['ror_lower']), column(stats['ror_upper']),
+        column(stats['chi_square']), is_signal.tolist(),
+    ]
+    return list(zip(*columns))
+
+
+def run(conn, chunk_size=50000, min_reports=1):
+    """Recompute drug_safety_signals; return (pairs written, signals flagged)."""
+    written = flagged = 0
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE TEMP TABLE report_drugs ON COMMIT DROP AS {_REPORT_DRUGS}')
+        total, by_drug, by_pt = _marginals(cur)
+        cur.execute('DELETE FROM drug_safety_signals')
+
+        with conn.cursor(name='signal_detection_pairs') as pairs:
+            pairs.itersize = chunk_size
+            pairs.execute('''
+                SELECT drug_id, side_effect_id, COUNT(*)
+                FROM report_drugs
+                GROUP BY drug_id, side_effect_id
+                HAVING COUNT(*) >= %s
+            ''', (min_reports,))
+            while True:
+                rows = pairs.fetchmany(chunk_size)
+                if not rows:
+                    break
+                scored = _score_chunk(rows, total, by_drug, by_pt)
+                execute_values(cur, '''
+                    INSERT INTO drug_safety_signals (
+                        drug_id, side_effect_id, report_count, drug_report_count, pt_report_count,
+                        total_reports, prr, prr_lower, prr_upper, ror, ror_lower, ror_upper,
+                        chi_square, is_signal
+                    ) VALUES %s
+                ''', scored, page_size=1000)
+                written += len(scored)
+                flagged += sum(1 for row in scored if row[-1])
+    conn.commit()
+    return written, flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute PRR/ROR drug safety signals from patient reports.')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='pairs fetched and scored per batch')
+    parser.add_argument('--min-reports', type=int, default=1, help='skip pairs reported fewer times than this')
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        written, flagged = run(conn, chunk_size=args.chunk_size, min_reports=args.min_reports)
+        print(f'wrote {written} drug/side effect pairs, {flagged} signals')
+        return 0
+    except Exception as e:
+        conn.rollback()
+        print(f'signal detection failed: {e}', file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
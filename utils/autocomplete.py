@@ -0,0 +1,121 @@
+"""In-memory prefix autocomplete over a fixed set of names.
+
+Names are normalized (lowercase, punctuation folded to spaces) and kept in two
+sorted arrays: whole names and individual tokens. A lookup is a couple of
+bisects plus a scan over the matching slice, so it answers in microseconds
+without touching the database.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Abbreviations patients type for common salt/formulation words.
+TOKEN_SYNONYMS = {
+    'hcl': ('hydrochloride',),
+    'hbr': ('hydrobromide',),
+    'na': ('sodium',),
+    'k': ('potassium',),
+    'ca': ('calcium',),
+    'mg': ('magnesium',),
+    'er': ('extended',),
+    'xr': ('extended',),
+    'sr': ('sustained',),
+    'ir': ('immediate',),
+}
+
+
+def normalize(text):
+    """Lowercase, strip accents and fold punctuation to single spaces."""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def _prefix_range(sorted_keys, prefix):
+    lo = bisect_left(sorted_keys, prefix)
+    hi = bisect_left(sorted_keys, prefix + '\uffff', lo)
+    return lo, hi
+
+
+class PrefixIndex:
+    """Prefix and token-prefix lookup over (key, display_name) pairs.
+
+    "metf" matches names starting with it; "met hcl" matches names where every
+    query token prefixes some name token ("metformin hydrochloride").
+    """
+
+    def __init__(self, items, synonyms=TOKEN_SYNONYMS):
+        entries = sorted(
+            (norm, key, display)
+            for key, display in items
+            for norm in (normalize(display),)
+            if norm
+        )
+        self._names = [e[0] for e in entries]
+        self._keys = [e[1] for e in entries]
+        self._displays = [e[2] for e in entries]
+        self._tokens_of = [tuple(name.split()) for name in self._names]
+
+        pairs = sorted(
+            (token, i)
+            for i, tokens in enumerate(self._tokens_of)
+            for token in set(tokens)
+        )
+        self._token_keys = [p[0] for p in pairs]
+        self._token_entries = [p[1] for p in pairs]
+        self._synonyms = synonyms
+
+    def __len__(self):
+        return len(self._names)
+
+    def _alternatives(self, token):
+        return (token,) + tuple(self._synonyms.get(token, ()))
+
+    def search(self, query, limit=10):
+        """Return up to `limit` (key, display_name) pairs, whole-name prefixes first."""
+        norm = normalize(query)
+        if not norm or limit <= 0:
+            return []
+
+        seen = set()
+        results = []
+
+        lo, hi = _prefix_range(self._names, norm)
+        for i in range(lo, min(hi, lo + limit)):
+            seen.add(i)
+            results.append(i)
+        if len(results) >= limit:
+            return [(self._keys[i], self._displays[i]) for i in results]
+
+        alternatives = [self._alternatives(t) for t in norm.split()]
+        ranges = [[_prefix_range(self._token_keys, alt) for alt in alts] for alts in alternatives]
+        # Drive the scan from the most selective query token.
+        pivot = min(range(len(ranges)), key=lambda k: sum(h - l for l, h in ranges[k]))
+
+        token_matches = []
+        wanted = limit - len(results)
+        for lo, hi in ranges[pivot]:
+            for j in range(lo, hi):
+                i = self._token_entries[j]
+                if i in seen:
+                    continue
+                seen.add(i)
+                if self._matches_all(self._tokens_of[i], alternatives):
+                    token_matches.append(i)
+                    if len(token_matches) >= wanted:
+                        break
+            if len(token_matches) >= wanted:
+                break
+
+        token_matches.sort(key=lambda i: (len(self._tokens_of[i]), self._names[i]))
+        results.extend(token_matches)
+        return [(self._keys[i], self._displays[i]) for i in results]
+
+    @staticmethod
+    def _matches_all(name_tokens, alternatives):
+        return all(
+            any(token.startswith(alt) for alt in alts for token in name_tokens)
+            for alts in alternatives
+        )
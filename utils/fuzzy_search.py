@@ -0,0 +1,147 @@
+"""Typo-tolerant name matching for drug and side-effect search.
+
+Candidates come from a trigram inverted index (names sharing the most
+trigrams with the query), and only the best of those are checked with a
+bounded Levenshtein distance against the whole name, each of its tokens and
+its prefix. A per-query time budget keeps keystroke searches responsive on
+catalogs of tens of thousands of names.
+"""
+import time
+
+import numpy as np
+
+from utils.autocomplete import normalize
+
+
+def _trigrams(text):
+    grams = set()
+    for token in text.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """Return the edit distance between a and b, or max_distance + 1 if it is larger.
+
+    Only the diagonal band of width 2 * max_distance + 1 is computed.
+    """
+    if a == b:
+        return 0
+    too_far = max_distance + 1
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_distance:
+        return too_far
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    if la == 0:
+        return lb
+    previous = [i if i <= max_distance else too_far for i in range(la + 1)]
+    for j in range(1, lb + 1):
+        cb = b[j - 1]
+        lo = max(1, j - max_distance)
+        hi = min(la, j + max_distance)
+        current = [too_far] * (la + 1)
+        if j <= max_distance:
+            current[0] = j
+        row_min = current[0] if lo == 1 else too_far
+        left = current[lo - 1]
+        for i in range(lo, hi + 1):
+            value = previous[i - 1] if a[i - 1] == cb else previous[i - 1] + 1
+            if previous[i] + 1 < value:
+                value = previous[i] + 1
+            if left + 1 < value:
+                value = left + 1
+            current[i] = left = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return previous[la] if previous[la] <= max_distance else too_far
+
+
+def default_max_distance(query):
+    """Typos allowed for a query of this length."""
+    length = len(query)
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return 1
+    if length <= 9:
+        return 2
+    return 3
+
+
+class FuzzyIndex:
+    """Ranked approximate lookup over (key, display_name) pairs."""
+
+    def __init__(self, items):
+        self._keys = []
+        self._displays = []
+        self._names = []
+        self._tokens = []
+        postings = {}
+        for key, display in items:
+            norm = normalize(display)
+            if not norm:
+                continue
+            idx = len(self._names)
+            self._keys.append(key)
+            self._displays.append(display)
+            self._names.append(norm)
+            self._tokens.append(tuple(norm.split()))
+            for gram in _trigrams(norm):
+                postings.setdefault(gram, []).append(idx)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self._names)
+
+    def _distance(self, query, idx, max_distance):
+        name = self._names[idx]
+        best = bounded_levenshtein(query, name[:len(query)], max_distance)
+        if best == 0:
+            return 0
+        if ' ' not in query:
+            for token in self._tokens[idx]:
+                best = min(best, bounded_levenshtein(query, token[:len(query) + 1], max_distance))
+                if best == 0:
+                    break
+        return min(best, bounded_levenshtein(query, name, max_distance))
+
+    def search(self, query, limit=10, max_distance=None, budget_ms=8.0, max_candidates=100):
+        """Return up to `limit` (key, display_name, distance) tuples, closest first.
+
+        Stops verifying candidates once `budget_ms` is spent and returns what
+        it has ranked so far.
+        """
+        norm = normalize(query)
+        if not norm:
+            return []
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        if max_distance is None:
+            max_distance = default_max_distance(norm)
+
+        postings = [p for p in (self._postings.get(g) for g in _trigrams(norm)) if p is not None]
+        if not postings:
+            return []
+        # Shared-trigram counts for every name at once; only the best
+        # `max_candidates` go on to the (comparatively slow) edit distance.
+        counts = np.bincount(np.concatenate(postings), minlength=len(self._names))
+        candidates = np.flatnonzero(counts)
+        if len(candidates) > max_candidates:
+            top = np.argpartition(counts[candidates], -max_candidates)[-max_candidates:]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-counts[candidates], kind='stable')]
+
+        matches = []
+        for checked, idx in enumerate(candidates.tolist()):
+            if checked and time.perf_counter() > deadline:
+                break
+            distance = self._distance(norm, idx, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -int(counts[idx]), len(self._names[idx]), idx))
+
+        matches.sort()
+        return [(self._keys[m[3]], self._displays[m[3]], m[0]) for m in matches[:limit]]
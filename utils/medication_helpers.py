@@ -1,13 +1,13 @@
 """Helper functions for medication tracking to reduce code duplication."""
 
 import streamlit as st
-from data.medications import get_drug_display_name
+from data.medications import get_drug_display_name, get_drug_display_names
 
 
-def build_medication_dict(med):
+def build_medication_dict(med, drug_name=None):
     """Build a standardized medication dictionary from a patient_medication record."""
     return {
-        'drug_name': get_drug_display_name(med['drug_id']),
+        'drug_name': drug_name or get_drug_display_name(med['drug_id']),
         'dose': med.get('dose', ''),
         'instructions': med.get('instructions', ''),
         'prescribed_by': med.get('prescribed_by', ''),
@@ -15,6 +15,12 @@ def build_medication_dict(med):
     }
 
 
+def build_medication_dicts(meds):
+    """Build medication dicts for a list of records, resolving all drug names in one query."""
+    names = get_drug_display_names(med['drug_id'] for med in meds)
+    return [build_medication_dict(med, names.get(med['drug_id'])) for med in meds]
+
+
 def render_stat_card(value, label, color):
     """Render a statistics card with consistent styling."""
     return f"""